@@ -4,9 +4,8 @@ import re
 import threading
 import gradio as gr
 from gradio_modal import Modal
-import chromadb
-from downloader import export_channel_json
-from modules.channel_utils import fetch_channel_dataframe
+from downloader import export_channel
+from modules.channel_utils import VIDEOS_PAGE_SIZE, count_videos, fetch_channel_dataframe
 from modules.collector import fetch_all_channel_videos
 from modules.db import (
     delete_channel_from_collection,
@@ -14,15 +13,25 @@ from modules.db import (
     get_indexed_channels,
 )
 from modules.indexer import index_videos
-from modules.answerer import answer_query, LLMAnswer, VideoItem, build_video_html
+from modules.metrics import start_metrics_server
+from modules.answerer import (
+    answer_query,
+    astream_answer_query,
+    LLMAnswer,
+    VideoItem,
+    build_video_html,
+)
 from dotenv import load_dotenv
 
 from youtube_poller import start_poll
-from youtube_sync import sync_channels_from_youtube
-import pandas as pd
+from youtube_sync import resume_interrupted_jobs, sync_channels_from_youtube
 
 load_dotenv()
 
+# questions answered at once per process; the query path is async, so these
+# are cheap coroutines on Gradio's event loop rather than worker threads
+QUERY_CONCURRENCY_LIMIT = int(os.getenv("QUERY_CONCURRENCY_LIMIT", "64"))
+
 
 # -------------------------------
 # Utility functions
@@ -79,7 +88,7 @@ def index_channels(channel_urls: str):
 
     # sync all channels, streaming progress
     for message, videos_count in sync_channels_from_youtube(yt_api_key, urls):
-        total_videos = videos_count  # accumulate actual number of videos indexed
+        total_videos += videos_count  # accumulate actual number of videos indexed
         yield message, gr.update(), gr.update()
 
     # final UI update
@@ -97,12 +106,19 @@ def init(progress: gr.Progress = None):
         yield msg
 
 
+def resume_sync_jobs():
+    """Finish syncs an earlier run of the app was in the middle of."""
+    for message, _ in resume_interrupted_jobs(os.environ["YOUTUBE_API_KEY"]):
+        print(f"[SYNC] {message}")
+
+
 def refresh_all_channels():
     yt_api_key = os.environ["YOUTUBE_API_KEY"]
     channels = get_indexed_channels(get_collection())
 
     if not channels:
-        return "⚠️ No channels available to refresh.", refresh_channel_list()
+        yield "⚠️ No channels available to refresh.", refresh_channel_list()
+        return
 
     # build list of URLs
     urls = []
@@ -111,10 +127,13 @@ def refresh_all_channels():
         if url:
             urls.append(url)
 
-    # re-index all at once
-    total_videos = sync_channels_from_youtube(yt_api_key, urls)
+    # re-index all at once (channels sync concurrently), streaming progress
+    total_videos = 0
+    for message, videos_count in sync_channels_from_youtube(yt_api_key, urls):
+        total_videos += videos_count
+        yield message, gr.update()
 
-    return (
+    yield (
         f"🔄 Refreshed {len(urls)} channels, re-indexed {total_videos} videos.",
         refresh_channel_list(),
     )
@@ -150,15 +169,16 @@ def delete_channel(channel_url: str):
 # -------------------------------
 # LLM query
 # -------------------------------
-def handle_query(query: str, search_channel_id: str):
-    answer_text, video_html = answer_query(
+async def handle_query(query: str, search_channel_id: str):
+    # stream: candidates first, then the answer as it is generated
+    async for answer_text, video_html in astream_answer_query(
         query, get_collection(), channel_id=search_channel_id, top_k=10
-    )
-    if not answer_text:
-        answer_text = "No answer available."
-    if not video_html or not isinstance(video_html, str):
-        video_html = ""  # ensure string for gr.HTML
-    return answer_text, video_html
+    ):
+        if not answer_text:
+            answer_text = "No answer available."
+        if not video_html or not isinstance(video_html, str):
+            video_html = ""  # ensure string for gr.HTML
+        yield answer_text, video_html
 
 
 # -------------------------------
@@ -203,6 +223,13 @@ with gr.Blocks() as demo:
             wrap=True,
             col_count=(4, "fixed"),
         )
+        # one page at a time; the cursors list remembers where each page starts
+        videos_page = gr.State(1)
+        videos_cursors = gr.State([])
+        with gr.Row():
+            videos_prev_btn = gr.Button("⬅️ Previous", size="sm", scale=0)
+            videos_page_label = gr.Markdown()
+            videos_next_btn = gr.Button("Next ➡️", size="sm", scale=0)
 
     # Modal to add new channels
     with Modal(visible=False) as add_channel_modal:
@@ -410,6 +437,7 @@ with gr.Blocks() as demo:
                 handle_query,
                 inputs=[question, search_channel],
                 outputs=[answer, video_embed],
+                concurrency_limit=QUERY_CONCURRENCY_LIMIT,
             ).then(
                 enable_component, outputs=[question]
             ).then(
@@ -417,10 +445,33 @@ with gr.Blocks() as demo:
             )
 
             # Show videos modal when button clicked
-            def show_selected_channel_videos(selected_channel_id):
+            def show_channel_videos_page(selected_channel_id, page, cursors):
                 # print("selected_channel_id = ", selected_channel_id)
-                df = fetch_channel_dataframe(selected_channel_id)
-                return gr.update(value=df, label=f"{len(df)} videos")
+                total = count_videos(selected_channel_id)
+                pages = max(1, -(-total // VIDEOS_PAGE_SIZE))
+                page = min(max(1, page), pages)
+                df = fetch_channel_dataframe(selected_channel_id, page, cursors=cursors)
+                return (
+                    gr.update(value=df, label=f"{total} videos"),
+                    page,
+                    cursors,
+                    f"Page {page} of {pages}",
+                )
+
+            def show_selected_channel_videos(selected_channel_id):
+                return show_channel_videos_page(selected_channel_id, 1, [])
+
+            videos_page_outputs = [channel_videos_df, videos_page, videos_cursors, videos_page_label]
+            videos_prev_btn.click(
+                lambda channel_id, page, cursors: show_channel_videos_page(channel_id, page - 1, cursors),
+                inputs=[channel_radio, videos_page, videos_cursors],
+                outputs=videos_page_outputs,
+            )
+            videos_next_btn.click(
+                lambda channel_id, page, cursors: show_channel_videos_page(channel_id, page + 1, cursors),
+                inputs=[channel_radio, videos_page, videos_cursors],
+                outputs=videos_page_outputs,
+            )
 
             channel_radio.change(
                 enable_if_not_none, inputs=[channel_radio], outputs=[show_videos_btn]
@@ -430,7 +481,7 @@ with gr.Blocks() as demo:
             ).then(
                 show_selected_channel_videos,
                 inputs=[channel_radio],
-                outputs=[channel_videos_df],
+                outputs=videos_page_outputs,
             ).then(
                 show_component, outputs=[videos_list_modal]
             ).then(
@@ -468,7 +519,7 @@ with gr.Blocks() as demo:
         ).then(hide_component, outputs=[download_ready_btn]).then(
             show_component, outputs=[download_modal]
         ).then(
-            export_channel_json, inputs=channel_radio, outputs=download_ready_btn
+            export_channel, inputs=channel_radio, outputs=download_ready_btn
         ).then(
             hide_component, outputs=[download_status]
         ).then(
@@ -476,6 +527,9 @@ with gr.Blocks() as demo:
         )
 
 if __name__ == "__main__":
+    start_metrics_server()
+    if os.getenv("SYNC_RESUME_ON_START", "1") != "0":
+        threading.Thread(target=resume_sync_jobs, daemon=True).start()
     for msg in init():
         print(msg)
     # Start polling in a background thread
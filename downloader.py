@@ -1,20 +1,224 @@
-import gradio as gr
+# downloader.py
+"""
+Channel export and import.
+
+An export is a zip with three entries, written page by page so memory stays
+bounded however large the channel is:
+
+    manifest.json   format version, channel, embedding model/dimensions,
+                    vector dtype and video count
+    videos.ndjson   one {"id", "document", "metadata"} object per line
+    embeddings.npy  (count, dimensions) float16/float32 matrix; row i belongs
+                    to line i of videos.ndjson
+
+Importing a dump writes the stored vectors straight back into the
+collection (no YouTube or embedding calls), after checking that they come
+from the embedding model and dimensions this install uses.
+
+    python downloader.py export <channel id or URL> [--dtype float32] [--no-compress]
+    python downloader.py import <dump.zip> [<dump.zip> ...]
+"""
+import argparse
 import json
-import tempfile
 import os
+import re
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+
+from modules.db import get_client, get_collection
+from modules.embeddings import embedding_profile
+from modules.indexer import drop_existing, store_records
+from modules.registry import get_channel, get_channel_by_url
+from modules.sync_state import advance_watermark
+
+EXPORT_FORMAT = "yt-channel-export"
+EXPORT_VERSION = 1
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+EXPORT_EMBEDDING_DTYPE = os.getenv("EXPORT_EMBEDDING_DTYPE", "float16")  # or float32
+EXPORT_COMPRESS = os.getenv("EXPORT_COMPRESS", "1") != "0"
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+
+def _resolve_channel(channel: str) -> dict:
+    """Accept a channel id or the channel URL the UI passes around."""
+    return get_channel(channel) or get_channel_by_url(channel) or {"channel_id": channel}
+
+
+def iter_channel_records(collection, channel_id: str, page_size: int = EXPORT_PAGE_SIZE):
+    """Yield a channel's stored records a page at a time."""
+    offset = 0
+    while True:
+        page = collection.get(
+            where={"channel_id": channel_id},
+            include=["embeddings", "documents", "metadatas"],
+            limit=page_size,
+            offset=offset,
+        )
+        if len(page["ids"]):
+            yield page
+        if len(page["ids"]) < page_size:
+            break
+        offset += page_size
+
+
+# -------------------------------
+# Export
+# -------------------------------
+def export_channel(
+    channel: str,
+    dtype: str = EXPORT_EMBEDDING_DTYPE,
+    compress: bool = EXPORT_COMPRESS,
+    out_dir: str = None,
+) -> str:
+    """Export one channel (by id or URL) and return the path of the zip."""
+    info = _resolve_channel(channel)
+    channel_id = info["channel_id"]
+    model_name, dimensions = embedding_profile()
+    dtype = np.dtype(dtype)
+
+    out_dir = out_dir or tempfile.mkdtemp()
+    slug = re.sub(r"[^\w.-]+", "_", info.get("channel_title") or channel_id).strip("_") or "channel"
+    path = os.path.join(out_dir, f"{slug}.export.zip")
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+
+    count, dims = 0, None
+    with tempfile.TemporaryFile() as vectors, zipfile.ZipFile(path, "w", compression) as zf:
+        # metadata streams straight into the zip; vectors go to a scratch file
+        # first because the .npy header needs the final row count
+        with zf.open("videos.ndjson", "w", force_zip64=True) as out:
+            for page in iter_channel_records(get_collection(), channel_id):
+                for vid_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                    line = {"id": vid_id, "document": document, "metadata": metadata}
+                    out.write(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n")
+                matrix = np.asarray(page["embeddings"], dtype=dtype)
+                if dims is None:
+                    dims = matrix.shape[1]
+                vectors.write(matrix.tobytes())
+                count += len(page["ids"])
+
+        vectors.seek(0)
+        with zf.open("embeddings.npy", "w", force_zip64=True) as out:
+            np.lib.format.write_array_header_1_0(
+                out, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (count, dims or dimensions)}
+            )
+            shutil.copyfileobj(vectors, out)
+
+        manifest = {
+            "format": EXPORT_FORMAT,
+            "version": EXPORT_VERSION,
+            "channel_id": channel_id,
+            "channel_title": info.get("channel_title"),
+            "channel_url": info.get("channel_url"),
+            # vectors from another backend (dimension mismatch) are exported unlabelled
+            "embedding_model": model_name if dims in (None, dimensions) else None,
+            "dimensions": dims or dimensions,
+            "dtype": dtype.name,
+            "count": count,
+        }
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    print(f"[EXPORT] {count} videos of {channel_id} → {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    return path
+
+
+# -------------------------------
+# Import
+# -------------------------------
+def read_manifest(zf: zipfile.ZipFile) -> dict:
+    manifest = json.loads(zf.read("manifest.json"))
+    if manifest.get("format") != EXPORT_FORMAT or manifest.get("version") != EXPORT_VERSION:
+        raise ValueError(f"Not a {EXPORT_FORMAT} v{EXPORT_VERSION} dump: {manifest.get('format')} v{manifest.get('version')}")
+
+    model_name, dimensions = embedding_profile()
+    if (manifest.get("embedding_model"), manifest.get("dimensions")) != (model_name, dimensions):
+        raise ValueError(
+            f"Dump vectors are {manifest.get('embedding_model')} ({manifest.get('dimensions')} dims), "
+            f"this index uses {model_name} ({dimensions} dims); re-index the channel instead"
+        )
+    return manifest
+
+
+def _read_npy_header(f):
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(f)
+    return np.lib.format.read_array_header_2_0(f)
+
+
+def iter_dump_batches(zf: zipfile.ZipFile, batch_size: int):
+    """Yield Chroma-ready record batches, reading lines and vector rows in step."""
+    with zf.open("videos.ndjson") as lines, zf.open("embeddings.npy") as vectors:
+        shape, fortran_order, dtype = _read_npy_header(vectors)
+        if fortran_order or len(shape) != 2:
+            raise ValueError(f"Unexpected embeddings.npy layout: shape={shape}, fortran_order={fortran_order}")
+        rows, dims = shape
+        row_bytes = dims * dtype.itemsize
+
+        for start in range(0, rows, batch_size):
+            n = min(batch_size, rows - start)
+            matrix = np.frombuffer(vectors.read(n * row_bytes), dtype=dtype).reshape(n, dims)
+            records = {"ids": [], "documents": [], "metadatas": []}
+            for _ in range(n):
+                line = json.loads(lines.readline())
+                records["ids"].append(line["id"])
+                records["documents"].append(line["document"])
+                records["metadatas"].append(line["metadata"])
+            records["embeddings"] = matrix.astype(np.float32)
+            yield records
+
+        if lines.readline():
+            raise ValueError("videos.ndjson has more lines than embeddings.npy has rows")
+
+
+def import_channel(path: str, collection=None, batch_size: int = IMPORT_BATCH_SIZE) -> int:
+    """
+    Restore an exported channel into the collection; returns the number of
+    videos added. Videos whose ids are already stored are skipped.
+    """
+    collection = collection or get_collection()
+    batch_size = min(batch_size, get_client().get_max_batch_size())
+
+    added, skipped, dated = 0, 0, []
+    with zipfile.ZipFile(path) as zf:
+        manifest = read_manifest(zf)
+        print(f"[IMPORT] {manifest['count']} videos of {manifest['channel_id']} from {path}")
+        for records in iter_dump_batches(zf, batch_size):
+            dated.extend(
+                {"video_id": vid_id, "published_at": meta.get("published_at")}
+                for vid_id, meta in zip(records["ids"], records["metadatas"])
+            )
+            fresh = drop_existing(collection, records)
+            skipped += len(records["ids"]) - len(fresh["ids"])
+            # the exporting install's seq numbers would collide with the ones
+            # this install hands out next; number the videos afresh instead
+            for meta in fresh["metadatas"]:
+                meta.pop("seq", None)
+            added += store_records(collection, fresh)
+
+    # the dump holds the whole channel up to its export, so a delta sync
+    # only needs to fetch what came after it
+    advance_watermark(manifest["channel_id"], dated)
+    print(f"[IMPORT] ✅ Added {added} videos, skipped {skipped} already indexed")
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import indexed channels")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export")
+    export_cmd.add_argument("channel", help="channel id or URL")
+    export_cmd.add_argument("--dtype", default=EXPORT_EMBEDDING_DTYPE, choices=["float16", "float32"])
+    export_cmd.add_argument("--no-compress", action="store_true")
+    export_cmd.add_argument("--out-dir", default=".")
+    import_cmd = commands.add_parser("import")
+    import_cmd.add_argument("paths", nargs="+")
+    args = parser.parse_args()
 
-from modules.db import fetch_channel_data
-
-def json_serializer(obj):
-    if hasattr(obj, "tolist"):  # NumPy arrays
-        return obj.tolist()
-    return str(obj)
-
-def export_channel_json(channel_id):
-    data = fetch_channel_data(channel_id)
-    
-    # Save to a temporary JSON file
-    fd, path = tempfile.mkstemp(suffix=".json")
-    with os.fdopen(fd, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False, default=json_serializer)
-    return path
\ No newline at end of file
+    if args.command == "export":
+        export_channel(args.channel, dtype=args.dtype, compress=not args.no_compress, out_dir=args.out_dir)
+    else:
+        for dump in args.paths:
+            import_channel(dump)
@@ -1,10 +1,17 @@
 # -------------------------------
 # 4. Answerer
 # -------------------------------
+import asyncio
+import time
 from typing import List
+import jiter
 from pydantic import BaseModel
-from openai import OpenAI
-from modules.retriever import retrieve_videos
+from modules.answer_cache import ANSWER_CACHE_ENABLED, answer_cache_key, get_answer_cache
+from modules.clients import get_async_openai_client, get_openai_client
+from modules.context import compact_context
+from modules.metrics import TOKEN_BUCKETS, inc, observe, span
+from modules.registry import content_stamp
+from modules.retriever import aretrieve_videos, normalize_query, retrieve_videos
 
 
 # -------------------------------
@@ -22,63 +29,328 @@ class LLMAnswer(BaseModel):
     top_videos: List[VideoItem]
 
 
+# -------------------------------
+# Prompt
+# -------------------------------
+ANSWER_MODEL = "gpt-4o-mini"
+# bump whenever the prompt or its context format changes, so cached answers
+# produced by the old prompt are not served
+PROMPT_VERSION = "2"
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant that answers questions using YouTube video metadata. "
+    "Return your response strictly as the LLMAnswer class, including 'answer_text' and a list of **only the most relevant** 'top_videos'.\n"
+    "- `answer_text` MUST be very short and concise in natural language (max 100 words).\n"
+    "- Use `top_videos` to include only the top 3 most relevant items from context.\n"
+    "- Do not include all items unless all are clearly relevant.\n"
+)
+
+
+def build_context(results: list, query: str = "") -> str:
+    """Build context lines for the LLM, trimmed to the context token budget."""
+    context_text, report = compact_context(query, results)
+    for stage in ("before", "after"):
+        observe(
+            "context_tokens",
+            report[f"tokens_{stage}"],
+            TOKEN_BUCKETS,
+            help_text="Estimated prompt context tokens before/after compaction",
+            stage=stage,
+        )
+    inc(
+        "boilerplate_tokens_saved_total",
+        report["tokens_boilerplate"],
+        help_text="Estimated boilerplate tokens stripped",
+        stage="prompt",
+    )
+    print(
+        f"[CONTEXT] {report['kept_videos']}/{report['videos']} videos, "
+        f"~{report['tokens_before']} → ~{report['tokens_after']} tokens "
+        f"(~{report['tokens_boilerplate']} boilerplate)"
+    )
+    return context_text
+
+
+def build_messages(query: str, context_text: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"Question: {query}\n\nCandidate videos:\n{context_text}\n\nPick only the relevant ones.",
+        },
+    ]
+
+
+def _answer_key(query: str, channel_id: str, results: list) -> str:
+    return answer_cache_key(
+        normalize_query(query),
+        channel_id,
+        [r.get("video_id") for r in results if isinstance(r, dict)],
+        PROMPT_VERSION,
+        ANSWER_MODEL,
+        content_stamp(channel_id),
+    )
+
+
+def get_cached_answer(key: str):
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    cached = get_answer_cache().get(key)
+    inc("answer_cache_total", help_text="Answer cache lookups", result="hit" if cached else "miss")
+    return LLMAnswer.model_validate_json(cached) if cached else None
+
+
+def cache_answer(key: str, llm_answer: LLMAnswer):
+    if ANSWER_CACHE_ENABLED:
+        get_answer_cache().put(key, llm_answer.model_dump_json())
+
+
+def _record_usage(completion, mode: str):
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return
+    help_text = "LLM tokens used by answers"
+    inc("llm_tokens_total", usage.prompt_tokens or 0, help_text=help_text, kind="prompt", mode=mode)
+    inc("llm_tokens_total", usage.completion_tokens or 0, help_text=help_text, kind="completion", mode=mode)
+
+
+def _observe_stream_request(seconds: float = None):
+    """
+    What span("llm_request", mode="stream") would record for a streamed
+    answer. A span cannot be used there: it would stay open across our
+    yields and time the consumer. Pass None to count a failed stream.
+    """
+    if seconds is None:
+        inc("stage_errors_total", help_text="Failed pipeline stage executions", stage="llm_request", mode="stream")
+        return
+    observe("stage_seconds", seconds, help_text="Latency of pipeline stages", stage="llm_request", mode="stream")
+
+
+def _observe_first_token(started: float):
+    observe(
+        "llm_first_token_seconds",
+        time.perf_counter() - started,
+        help_text="Time from sending the prompt to the first streamed answer text",
+    )
+
+
+def render_answer(llm_answer: LLMAnswer):
+    answer_text = "\n## Answer : \n" + llm_answer.answer_text
+    video_html = build_video_html(llm_answer.top_videos)
+    return answer_text, video_html
+
+
 # -------------------------------
 # Main Function
 # -------------------------------
 def answer_query(
     query: str, collection, top_k: int = 5, channel_id: str = None
-) -> LLMAnswer:
+):
     """
     Answer a user query using YouTube video metadata.
-    Returns an LLMAnswer object with textual answer + list of videos.
+    Returns (answer markdown, top videos html) built from the LLMAnswer.
+    Answers are served from the answer cache when the same question retrieved
+    the same candidates before.
     """
-    results = retrieve_videos(query, collection, top_k=top_k, channel_id=channel_id)
+    with span("retrieve"):
+        results = retrieve_videos(query, collection, top_k=top_k, channel_id=channel_id)
 
     if not results:
-        return LLMAnswer(answer_text="No relevant videos found.", top_videos=[])
-
-    # Build context lines for the LLM
-    context_lines = []
-    for r in results:
-        if not isinstance(r, dict):
-            continue
-        vid_id = r.get("video_id", "")
-        title = r.get("video_title") or r.get("title", "")
-        channel = r.get("channel") or r.get("channel_title", "")
-        description = r.get("description", "")
-        context_lines.append(
-            f"- {title} ({channel}) (https://youtube.com/watch?v={vid_id})\n  description: {description}"
+        return render_answer(LLMAnswer(answer_text="No relevant videos found.", top_videos=[]))
+
+    key = _answer_key(query, channel_id, results)
+    llm_answer = get_cached_answer(key)
+    if llm_answer is None:
+        context_text = build_context(results, query)
+
+        # Call LLM with structured output
+        client = get_openai_client()
+        with span("llm_request", mode="parse"):
+            response = client.chat.completions.parse(
+                model=ANSWER_MODEL,
+                messages=build_messages(query, context_text),
+                response_format=LLMAnswer,
+            )
+        _record_usage(response, "parse")
+
+        llm_answer = response.choices[0].message.parsed
+        cache_answer(key, llm_answer)
+
+    return render_answer(llm_answer)
+
+
+def _candidate_items(results: list) -> list[VideoItem]:
+    return [
+        VideoItem(
+            video_id=r.get("video_id", ""),
+            title=r.get("video_title") or r.get("title", ""),
+            channel=r.get("channel") or r.get("channel_title", ""),
+            description=r.get("description", ""),
         )
+        for r in results
+        if isinstance(r, dict)
+    ]
 
-    context_text = "\n".join(context_lines)
-
-    # Call LLM with structured output
-    client = OpenAI()
-    response = client.chat.completions.parse(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful assistant that answers questions using YouTube video metadata. "
-                    "Return your response strictly as the LLMAnswer class, including 'answer_text' and a list of **only the most relevant** 'top_videos'.\n"
-                    "- `answer_text` MUST be very short and concise in natural language (max 100 words).\n"
-                    "- Use `top_videos` to include only the top 3 most relevant items from context.\n"
-                    "- Do not include all items unless all are clearly relevant.\n"
-                ),
-            },
-            {
-                "role": "user",
-                "content": f"Question: {query}\n\nCandidate videos:\n{context_text}\n\nPick only the relevant ones.",
-            },
-        ],
-        response_format=LLMAnswer,
-    )
 
-    llm_answer = response.choices[0].message.parsed
-    answer_text = "\n## Answer : \n" + llm_answer.answer_text
-    video_html = build_video_html(llm_answer.top_videos)
-    return answer_text, video_html
+def _partial_answer_text(snapshot: str) -> str:
+    # event.parsed only holds completed strings; parse the raw snapshot
+    # ourselves so the half-written answer_text comes through too
+    try:
+        partial = jiter.from_json(snapshot.encode("utf-8"), partial_mode="trailing-strings")
+    except ValueError:
+        return ""
+    return (partial.get("answer_text") or "") if isinstance(partial, dict) else ""
+
+
+def stream_answer_query(
+    query: str, collection, top_k: int = 5, channel_id: str = None
+):
+    """
+    Streaming variant of answer_query. Yields (answer markdown, videos html):
+    first right after retrieval with the candidate videos, then as
+    `answer_text` tokens arrive, and finally with the LLM's top-video selection.
+    """
+    with span("retrieve"):
+        results = retrieve_videos(query, collection, top_k=top_k, channel_id=channel_id)
+
+    if not results:
+        yield render_answer(LLMAnswer(answer_text="No relevant videos found.", top_videos=[]))
+        return
+
+    key = _answer_key(query, channel_id, results)
+    llm_answer = get_cached_answer(key)
+    if llm_answer is not None:
+        yield render_answer(llm_answer)
+        return
+
+    candidates_html = build_video_html(_candidate_items(results))
+    yield "\n## Answer : \n⏳ ...", candidates_html
+
+    client = get_openai_client()
+    messages = build_messages(query, build_context(results, query))
+    started = time.perf_counter()
+    consumer_seconds = 0.0  # spent at our yields, not waiting for the LLM
+    try:
+        with client.chat.completions.stream(
+            model=ANSWER_MODEL,
+            messages=messages,
+            response_format=LLMAnswer,
+            stream_options={"include_usage": True},
+        ) as stream:
+            streamed_text = ""
+            for event in stream:
+                if event.type != "content.delta":
+                    continue
+                text = _partial_answer_text(event.snapshot)
+                if text and text != streamed_text:
+                    if not streamed_text:
+                        _observe_first_token(started)
+                    streamed_text = text
+                    handed_off = time.perf_counter()
+                    yield "\n## Answer : \n" + text, candidates_html
+                    consumer_seconds += time.perf_counter() - handed_off
+
+            completion = stream.get_final_completion()
+    except Exception:
+        _observe_stream_request(None)
+        raise
+    _observe_stream_request(time.perf_counter() - started - consumer_seconds)
+    _record_usage(completion, "stream")
+    llm_answer = completion.choices[0].message.parsed
+
+    cache_answer(key, llm_answer)
+    yield render_answer(llm_answer)
+
+
+# -------------------------------
+# Async variants
+# -------------------------------
+# Same flow as above for async callers (the Gradio query handler): LLM and
+# embedding requests go through the shared AsyncOpenAI client, and the small
+# sqlite/Chroma lookups run in worker threads so the event loop never blocks.
+async def aanswer_query(
+    query: str, collection, top_k: int = 5, channel_id: str = None
+):
+    """Async answer_query."""
+    with span("retrieve"):
+        results = await aretrieve_videos(query, collection, top_k=top_k, channel_id=channel_id)
+
+    if not results:
+        return render_answer(LLMAnswer(answer_text="No relevant videos found.", top_videos=[]))
+
+    key = await asyncio.to_thread(_answer_key, query, channel_id, results)
+    llm_answer = await asyncio.to_thread(get_cached_answer, key)
+    if llm_answer is None:
+        client = get_async_openai_client()
+        context_text = await asyncio.to_thread(build_context, results, query)
+        with span("llm_request", mode="parse"):
+            response = await client.chat.completions.parse(
+                model=ANSWER_MODEL,
+                messages=build_messages(query, context_text),
+                response_format=LLMAnswer,
+            )
+        _record_usage(response, "parse")
+        llm_answer = response.choices[0].message.parsed
+        await asyncio.to_thread(cache_answer, key, llm_answer)
+
+    return render_answer(llm_answer)
+
+
+async def astream_answer_query(
+    query: str, collection, top_k: int = 5, channel_id: str = None
+):
+    """Async stream_answer_query; yields the same (answer markdown, videos html) updates."""
+    with span("retrieve"):
+        results = await aretrieve_videos(query, collection, top_k=top_k, channel_id=channel_id)
+
+    if not results:
+        yield render_answer(LLMAnswer(answer_text="No relevant videos found.", top_videos=[]))
+        return
+
+    key = await asyncio.to_thread(_answer_key, query, channel_id, results)
+    llm_answer = await asyncio.to_thread(get_cached_answer, key)
+    if llm_answer is not None:
+        yield render_answer(llm_answer)
+        return
+
+    candidates_html = build_video_html(_candidate_items(results))
+    yield "\n## Answer : \n⏳ ...", candidates_html
+
+    client = get_async_openai_client()
+    context_text = await asyncio.to_thread(build_context, results, query)
+    messages = build_messages(query, context_text)
+    started = time.perf_counter()
+    consumer_seconds = 0.0  # spent at our yields, not waiting for the LLM
+    try:
+        async with client.chat.completions.stream(
+            model=ANSWER_MODEL,
+            messages=messages,
+            response_format=LLMAnswer,
+            stream_options={"include_usage": True},
+        ) as stream:
+            streamed_text = ""
+            async for event in stream:
+                if event.type != "content.delta":
+                    continue
+                text = _partial_answer_text(event.snapshot)
+                if text and text != streamed_text:
+                    if not streamed_text:
+                        _observe_first_token(started)
+                    streamed_text = text
+                    handed_off = time.perf_counter()
+                    yield "\n## Answer : \n" + text, candidates_html
+                    consumer_seconds += time.perf_counter() - handed_off
+
+            completion = await stream.get_final_completion()
+    except Exception:
+        _observe_stream_request(None)
+        raise
+    _observe_stream_request(time.perf_counter() - started - consumer_seconds)
+    _record_usage(completion, "stream")
+    llm_answer = completion.choices[0].message.parsed
+
+    await asyncio.to_thread(cache_answer, key, llm_answer)
+    yield render_answer(llm_answer)
 
 
 def build_video_html(videos: list[VideoItem]) -> str:
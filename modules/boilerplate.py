@@ -0,0 +1,183 @@
+# modules/boilerplate.py
+"""
+Per-channel description boilerplate.
+
+Most channels append the same footer (social links, donation details,
+hashtags, "subscribe" lines) to every video description. Those lines say
+nothing about the video, yet they were embedded, stored and sent to the LLM
+with every result. Each channel therefore keeps a profile of how many of its
+videos contain each (whitespace- and case-normalised) description line:
+
+    a line found in at least BOILERPLATE_MIN_SHARE of a channel's videos,
+    and in at least BOILERPLATE_MIN_VIDEOS of them, is boilerplate
+
+The indexer feeds every batch of fetched videos into the profile before
+building their documents, so a footer is recognised from the first page of
+a new channel, and stores the documents without it. The answer prompt strips
+the same lines from retrieved descriptions, which also covers videos indexed
+before the footer was learned. Profiles and the tokens saved live in the
+sync state DB; the full description stays in the video metadata.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from modules.embeddings import estimate_tokens
+from modules.metrics import inc
+from modules.sync_state import transaction
+
+BOILERPLATE_ENABLED = os.getenv("BOILERPLATE_ENABLED", "1") != "0"
+BOILERPLATE_MIN_SHARE = float(os.getenv("BOILERPLATE_MIN_SHARE", "0.5"))
+BOILERPLATE_MIN_VIDEOS = int(os.getenv("BOILERPLATE_MIN_VIDEOS", "5"))
+# line counts kept per channel; lines seen once are pruned first
+MAX_TRACKED_LINES = 2000
+
+# "-----", "━━━━", "***": separators left dangling once a footer is cut
+_SEPARATOR = re.compile(r"^[\W_]+$")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+_profiles = {}  # channel_id -> {"videos", "counts": {line: videos}, "lines": boilerplate set}
+_lock = threading.Lock()
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split()).casefold()
+
+
+def _boilerplate_lines(videos: int, counts: dict) -> frozenset:
+    threshold = max(BOILERPLATE_MIN_VIDEOS, BOILERPLATE_MIN_SHARE * videos)
+    return frozenset(line for line, n in counts.items() if n >= threshold)
+
+
+def _profile(channel_id: str) -> dict:
+    """The channel's profile, loaded from the state DB on first use (call with _lock held)."""
+    profile = _profiles.get(channel_id)
+    if profile is None:
+        with transaction() as conn:
+            row = conn.execute(
+                "SELECT videos, line_counts FROM channel_boilerplate WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+        videos, counts = (row[0], json.loads(row[1])) if row else (0, {})
+        profile = _profiles[channel_id] = {
+            "videos": videos,
+            "counts": counts,
+            "lines": _boilerplate_lines(videos, counts),
+        }
+    return profile
+
+
+# -------------------------------
+# Learning
+# -------------------------------
+def learn(channel_id: str, descriptions: list):
+    """Count the distinct lines of each description towards the channel's profile."""
+    if not BOILERPLATE_ENABLED or not channel_id or not descriptions:
+        return
+    with _lock:
+        profile = _profile(channel_id)
+        counts = profile["counts"]
+        for description in descriptions:
+            for line in {_normalize(raw) for raw in (description or "").splitlines()} - {""}:
+                counts[line] = counts.get(line, 0) + 1
+        if len(counts) > MAX_TRACKED_LINES:
+            ranked = sorted(((n, line) for line, n in counts.items() if n > 1), reverse=True)
+            profile["counts"] = counts = {line: n for n, line in ranked[:MAX_TRACKED_LINES]}
+        profile["videos"] += len(descriptions)
+        profile["lines"] = _boilerplate_lines(profile["videos"], counts)
+
+        with transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO channel_boilerplate (channel_id, videos, line_counts, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(channel_id) DO UPDATE SET
+                    videos = excluded.videos,
+                    line_counts = excluded.line_counts,
+                    updated_at = excluded.updated_at
+                """,
+                (channel_id, profile["videos"], json.dumps(counts, ensure_ascii=False), time.time()),
+            )
+
+
+def forget(channel_id: str):
+    with _lock:
+        _profiles.pop(channel_id, None)
+        with transaction() as conn:
+            conn.execute("DELETE FROM channel_boilerplate WHERE channel_id = ?", (channel_id,))
+
+
+# -------------------------------
+# Stripping
+# -------------------------------
+def strip_boilerplate(channel_id: str, description: str) -> str:
+    """The description without the channel's boilerplate lines and the separators they leave."""
+    if not BOILERPLATE_ENABLED or not channel_id or not description:
+        return description
+    with _lock:
+        lines = _profile(channel_id)["lines"]
+    if not lines:
+        return description
+
+    kept = [line for line in description.splitlines() if _normalize(line) not in lines]
+    while kept and (not kept[-1].strip() or _SEPARATOR.match(kept[-1].strip())):
+        kept.pop()
+    return _BLANK_RUNS.sub("\n\n", "\n".join(kept)).strip()
+
+
+# -------------------------------
+# Stats
+# -------------------------------
+def record_stored(metadatas: list, documents: list):
+    """Count the tokens stripped from freshly stored documents, per channel."""
+    per_channel = {}
+    for meta, document in zip(metadatas, documents):
+        if not meta.get("channel_id"):
+            continue
+        full = f"{meta.get('video_title', '')} - {meta.get('description', '')}"
+        entry = per_channel.setdefault(meta["channel_id"], [0, 0])
+        entry[0] += estimate_tokens(full)
+        entry[1] += estimate_tokens(document)
+    if not per_channel:
+        return
+
+    with transaction() as conn:
+        for channel_id, (before, after) in per_channel.items():
+            conn.execute(
+                """
+                INSERT INTO channel_boilerplate (channel_id, tokens_before, tokens_after, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(channel_id) DO UPDATE SET
+                    tokens_before = tokens_before + excluded.tokens_before,
+                    tokens_after = tokens_after + excluded.tokens_after
+                """,
+                (channel_id, before, after, time.time()),
+            )
+    saved = sum(before - after for before, after in per_channel.values())
+    inc("boilerplate_tokens_saved_total", saved, help_text="Estimated boilerplate tokens stripped", stage="index")
+
+
+def boilerplate_stats(channel_id: str = None) -> dict:
+    """
+    {channel_id: {"videos", "lines", "tokens_before", "tokens_after",
+    "tokens_saved"}} for one channel or all of them; tokens are those of
+    the stored documents, with and without boilerplate.
+    """
+    query = "SELECT channel_id, videos, line_counts, tokens_before, tokens_after FROM channel_boilerplate"
+    params = ()
+    if channel_id:
+        query += " WHERE channel_id = ?"
+        params = (channel_id,)
+    with transaction() as conn:
+        rows = conn.execute(query, params).fetchall()
+    return {
+        row[0]: {
+            "videos": row[1],
+            "lines": len(_boilerplate_lines(row[1], json.loads(row[2]))),
+            "tokens_before": row[3],
+            "tokens_after": row[4],
+            "tokens_saved": row[3] - row[4],
+        }
+        for row in rows
+    }
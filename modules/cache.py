@@ -0,0 +1,78 @@
+# modules/cache.py
+"""
+In-process caching helpers: a thread-safe LRU cache with per-entry TTL, and
+per-channel data versions used to invalidate cached results when a
+channel's videos change.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+# -------------------------------
+# Data versions
+# -------------------------------
+_versions = {}
+_global_version = 0
+_versions_lock = threading.Lock()
+
+
+def bump_data_version(channel_ids):
+    """Call after a channel's stored videos change (add/delete)."""
+    global _global_version
+    with _versions_lock:
+        _global_version += 1
+        for cid in channel_ids:
+            _versions[cid] = _versions.get(cid, 0) + 1
+
+
+def data_version(channel_id: str = None) -> int:
+    """Version of one channel's data, or of the whole index when channel_id is None."""
+    with _versions_lock:
+        if channel_id is None:
+            return _global_version
+        return _versions.get(channel_id, 0)
@@ -1,33 +1,103 @@
+import os
+
 from modules.db import get_collection
-import pandas as pd
+from modules.metrics import span
+from modules.registry import (
+    backfill_channel_seq,
+    count_channel_videos,
+    get_channel_seq_bounds,
+)
 
 page_size = 10  # change if you like
+VIDEOS_PAGE_SIZE = int(os.getenv("VIDEOS_PAGE_SIZE", "100"))  # rows per page of the videos modal
 
 
 # -------------------------------
-# Fetch channel videos as HTML table with pagination
+# Counts + keyset pagination
 # -------------------------------
-def fetch_channel_html(channel_id: str, page: int = 1, page_size: int = 10):
+def count_videos(channel_id: str) -> int:
+    """O(1): served from the registry's maintained counter."""
+    return count_channel_videos(channel_id)
+
+
+def fetch_channel_page(channel_id: str, after_seq: int = 0, limit: int = 10):
+    """
+    Keyset pagination over a channel's videos in seq order.
+    Returns (metadatas, next_cursor); pass next_cursor back as after_seq for
+    the following page, next_cursor is None at the end.
+    Each call reads a bounded seq window, so page 900 costs the same as page 1.
+    """
     collection = get_collection()
+    video_count, highest_seq = get_channel_seq_bounds(channel_id)
+    if highest_seq < video_count:
+        # videos stored before seq numbers existed
+        backfill_channel_seq(collection, channel_id)
+        video_count, highest_seq = get_channel_seq_bounds(channel_id)
+
+    videos, lo, window = [], after_seq, limit
+    while len(videos) < limit and lo < highest_seq:
+        hi = min(lo + window, highest_seq)
+        with span("chroma_get", purpose="channel_page"):
+            results = collection.get(
+                where={
+                    "$and": [
+                        {"channel_id": channel_id},
+                        {"seq": {"$gt": lo}},
+                        {"seq": {"$lte": hi}},
+                    ]
+                },
+                include=["metadatas"],
+            )
+        videos.extend(sorted(results.get("metadatas") or [], key=lambda m: m["seq"]))
+        # seq gaps (e.g. a failed add) just widen the next window
+        lo, window = hi, window * 2
+
+    videos = videos[:limit]
+    next_cursor = videos[-1]["seq"] if videos and videos[-1]["seq"] < highest_seq else None
+    return videos, next_cursor
+
+
+# -------------------------------
+# Fetch channel videos as HTML table with pagination
+# -------------------------------
+def page_cursor(channel_id: str, page: int, page_size: int = 10, cursors: list = None):
+    """
+    The after_seq cursor of a page, or None past the last page. Seq numbers
+    have gaps (deletes, failed batches), so page N cannot be computed from N;
+    cursors[i] holds page i+1's cursor, and unknown ones are found by walking
+    forward from the last known page. The list is extended in place.
+    """
+    cursors = cursors if cursors is not None else []
+    if not cursors:
+        cursors.append(0)
+    while len(cursors) < page:
+        _, next_cursor = fetch_channel_page(channel_id, after_seq=cursors[-1], limit=page_size)
+        if next_cursor is None:
+            return None
+        cursors.append(next_cursor)
+    return cursors[page - 1]
+
+
+def _page_videos(channel_id: str, page: int, page_size: int, cursors: list = None) -> list:
+    """The metadatas on a page, remembering the following page's cursor."""
+    after_seq = page_cursor(channel_id, page, page_size, cursors)
+    if after_seq is None:
+        return []
+    videos, next_cursor = fetch_channel_page(channel_id, after_seq=after_seq, limit=page_size)
+    if cursors is not None and next_cursor is not None and len(cursors) == page:
+        cursors.append(next_cursor)
+    return videos
+
+
+def fetch_channel_html(channel_id: str, page: int = 1, page_size: int = 10, cursors: list = None):
+    """Pass the same cursors list (e.g. a gr.State) between pages to avoid re-walking."""
     offset = (page - 1) * page_size
 
-    all_results = collection.get(
-        where={"channel_id": channel_id}, include=["metadatas"]
-    )
-    total_count = (
-        len(all_results["metadatas"])
-        if all_results and "metadatas" in all_results
-        else 0
-    )
-    results = collection.get(
-        where={"channel_id": channel_id},
-        include=["documents", "metadatas"],
-        limit=page_size,
-        offset=offset,
-    )
+    total_count = count_videos(channel_id)
+    videos = _page_videos(channel_id, page, page_size, cursors)
 
     # handle empty
-    if not results or not results.get("metadatas"):
+    if not videos:
         return f"""
         <div style="display:flex;justify-content:center;align-items:center;
                     height:200px;flex-direction:column;color:#666;">
@@ -35,8 +105,6 @@ def fetch_channel_html(channel_id: str, page: int = 1, page_size: int = 10):
         </div>
         """
 
-    videos = results["metadatas"]
-
     # build table
     html = (
         f"<div>Total: {total_count} videos</div>"
@@ -70,23 +138,20 @@ def fetch_channel_html(channel_id: str, page: int = 1, page_size: int = 10):
 
 
 # -------------------------------
-# Fetch channel videos as HTML table with pagination
+# Fetch one page of channel videos as a DataFrame
 # -------------------------------
-def fetch_channel_dataframe(channel_id: str):
-    collection = get_collection()
-
-    results = collection.get(
-        where={"channel_id": channel_id}, include=["documents", "metadatas"]
-    )
-    total_count = len(results["metadatas"]) if results and "metadatas" in results else 0
-    # handle empty
-    if not results or not results.get("metadatas"):
-        return pd.DataFrame(data=[])
+def fetch_channel_dataframe(channel_id: str, page: int = 1, page_size: int = VIDEOS_PAGE_SIZE, cursors: list = None):
+    """
+    One page of the channel's videos, read by seq range like
+    fetch_channel_html; pass the same cursors list between pages. Empty past
+    the last page.
+    """
+    import pandas as pd
 
-    videos = results["metadatas"]
+    videos = _page_videos(channel_id, page, page_size, cursors)
 
     items = []
-    for idx, v in enumerate(videos, start=1):
+    for idx, v in enumerate(videos, start=(page - 1) * page_size + 1):
         item = {
             "#": idx,
             "title": v.get("video_title", "-"),
@@ -98,23 +163,30 @@ def fetch_channel_dataframe(channel_id: str):
     return pd.DataFrame(data=items)
 
 
-def update_table(channel_id, page):
-    return fetch_channel_html(channel_id, page, page_size), f"Page {page}"
+# `cursors` is per-channel paging state (a list, e.g. in a gr.State); start
+# from None or [] whenever the selected channel changes.
+def update_table(channel_id, page, cursors=None):
+    cursors = cursors if cursors is not None else []
+    return fetch_channel_html(channel_id, page, page_size, cursors), f"Page {page}", cursors
 
 
-def prev_page(channel_id, page):
+def prev_page(channel_id, page, cursors=None):
     new_page = max(1, page - 1)
+    cursors = cursors if cursors is not None else []
     return (
-        fetch_channel_html(channel_id, new_page, page_size),
+        fetch_channel_html(channel_id, new_page, page_size, cursors),
         f"Page {new_page}",
         new_page,
+        cursors,
     )
 
 
-def next_page(channel_id, page):
+def next_page(channel_id, page, cursors=None):
     new_page = page + 1
+    cursors = cursors if cursors is not None else []
     return (
-        fetch_channel_html(channel_id, new_page, page_size),
+        fetch_channel_html(channel_id, new_page, page_size, cursors),
         f"Page {new_page}",
         new_page,
+        cursors,
     )
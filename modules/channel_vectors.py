@@ -0,0 +1,274 @@
+# modules/channel_vectors.py
+"""
+Per-channel vector matrices for exact channel-scoped search.
+
+Most questions are asked about one channel. A filtered HNSW query over the
+whole collection is slow and, for a small channel in a large collection,
+misses neighbours. Instead every channel keeps its embeddings as a flat,
+memory-mapped matrix next to the Chroma DB:
+
+    <channel_id>.json   {"dims", "dtype"}
+    <channel_id>.vec    rows of `dims` values in `dtype`, appended as videos are stored
+    <channel_id>.ids    one video id per line; line i belongs to row i
+    <channel_id>.scl    int8 only: one float32 scale per row (row ≈ scale * int8 values)
+
+and a channel-scoped query is a brute-force dot product over it: exact
+results with latency linear in the channel's size. The indexer appends to
+the matrix after every Chroma write, channel deletes remove it, and a
+channel whose matrix is missing or stale is rebuilt from the collection.
+
+float16 and int8 matrices are 2x and 4x smaller than float32 at a small
+recall cost; the retriever can rescore their top candidates against the
+full-precision vectors in Chroma (CHANNEL_VECTORS_RESCORE). They only save
+space: numpy has no fast float16/int8 product, so every query upcasts the
+rows to float32 and scores slower than a float32 matrix, which stays the
+default. Fewer dimensions (EMBEDDING_DIMENSIONS) is what makes queries
+faster. tests/bench_recall.py measures the trade-offs.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+CHANNEL_VECTORS_PATH = os.getenv("CHANNEL_VECTORS_PATH", "./youtube_db/channel_vectors")
+CHANNEL_VECTORS_ENABLED = os.getenv("CHANNEL_VECTORS_ENABLED", "1") != "0"
+# float32, float16 or int8 (scalar-quantised per row); float32 scores fastest
+# (no conversion per query), the others are storage-only: 2x/4x smaller
+# files, slower queries
+CHANNEL_VECTORS_DTYPE = os.getenv("CHANNEL_VECTORS_DTYPE", "float32")
+# rescore RESCORE_FACTOR * top_k candidates of a float16/int8 matrix in full precision
+CHANNEL_VECTORS_RESCORE = os.getenv("CHANNEL_VECTORS_RESCORE", "1") != "0"
+RESCORE_FACTOR = int(os.getenv("CHANNEL_VECTORS_RESCORE_FACTOR", "4"))
+# channels larger than this are searched with Chroma's HNSW index instead
+EXACT_SEARCH_MAX_VIDEOS = int(os.getenv("EXACT_SEARCH_MAX_VIDEOS", "50000"))
+SEARCH_CHUNK_BYTES = 8 << 20  # float32 working set per scoring step; small enough to stay in cache
+
+
+def quantize_int8(matrix: np.ndarray) -> tuple:
+    """Symmetric per-row int8 quantisation: (int8 rows, float32 scales)."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def distances(matrix: np.ndarray, query: np.ndarray, space: str = "l2") -> np.ndarray:
+    """
+    Distances from a float32 query to each row, as Chroma defines them for
+    the given space (l2: squared euclidean, cosine: 1 - cosine similarity,
+    ip: 1 - dot).
+    """
+    dots = matrix @ query
+    if space == "ip":
+        return 1.0 - dots
+    norms = np.einsum("ij,ij->i", matrix, matrix)
+    query_norm = float(query @ query)
+    if space == "cosine":
+        return 1.0 - dots / np.sqrt(np.maximum(norms * query_norm, 1e-12))
+    return norms + query_norm - 2.0 * dots
+
+
+class ChannelVectors:
+    def __init__(self, root: str = CHANNEL_VECTORS_PATH, dtype: str = CHANNEL_VECTORS_DTYPE):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.dtype = np.dtype(dtype)
+        self.quantized = self.dtype == np.int8
+        self._lock = threading.RLock()
+        self._loaded = {}  # channel_id -> (file sizes, ids, matrix)
+        self._written = {}  # channel_id -> file sizes after this process's last append
+
+    def _path(self, channel_id: str, ext: str) -> str:
+        return os.path.join(self.root, f"{channel_id}.{ext}")
+
+    def _header(self, channel_id: str):
+        try:
+            with open(self._path(channel_id, "json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _row_count(self, channel_id: str, dims: int) -> int:
+        """Rows present in both the matrix and the id sidecar."""
+        try:
+            rows = os.path.getsize(self._path(channel_id, "vec")) // (dims * self.dtype.itemsize)
+            with open(self._path(channel_id, "ids"), "rb") as f:
+                ids = sum(1 for _ in f)
+            if self.quantized:
+                rows = min(rows, os.path.getsize(self._path(channel_id, "scl")) // 4)
+        except OSError:
+            return 0
+        return min(rows, ids)
+
+    def _files(self) -> tuple:
+        return ("vec", "ids", "scl") if self.quantized else ("vec", "ids")
+
+    # -------------------------------
+    # Writes
+    # -------------------------------
+    def add(self, channel_id: str, ids: list, embeddings):
+        """Append stored videos' vectors to their channel's matrix."""
+        if not ids:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        dims = matrix.shape[1]
+        with self._lock:
+            header = self._header(channel_id)
+            if header != {"dims": dims, "dtype": self.dtype.name}:
+                # new channel, or vectors of another shape: start over
+                self._drop(channel_id)
+                with open(self._path(channel_id, "json"), "w", encoding="utf-8") as f:
+                    json.dump({"dims": dims, "dtype": self.dtype.name}, f)
+            elif self._sizes(channel_id) != self._written.get(channel_id):
+                self._repair(channel_id, dims)
+            if self.quantized:
+                matrix, scales = quantize_int8(matrix)
+                with open(self._path(channel_id, "scl"), "ab") as scl:
+                    scl.write(scales.tobytes())
+            with open(self._path(channel_id, "vec"), "ab") as vec, open(self._path(channel_id, "ids"), "ab") as id_file:
+                vec.write(matrix.astype(self.dtype).tobytes())
+                id_file.write("".join(f"{vid_id}\n" for vid_id in ids).encode("utf-8"))
+            self._written[channel_id] = self._sizes(channel_id)
+            self._loaded.pop(channel_id, None)
+
+    def _sizes(self, channel_id: str) -> tuple:
+        try:
+            return tuple(os.path.getsize(self._path(channel_id, ext)) for ext in self._files())
+        except OSError:
+            return (0, 0)
+
+    def _repair(self, channel_id: str, dims: int):
+        """Cut both files back to the rows they share (a crash between the two writes)."""
+        rows = self._row_count(channel_id, dims)
+        with open(self._path(channel_id, "vec"), "ab") as vec:
+            vec.truncate(rows * dims * self.dtype.itemsize)
+        if self.quantized:
+            with open(self._path(channel_id, "scl"), "ab") as scl:
+                scl.truncate(rows * 4)
+        offset = self._ids_offset(channel_id, rows)
+        with open(self._path(channel_id, "ids"), "ab") as id_file:
+            id_file.truncate(offset)
+
+    def _ids_offset(self, channel_id: str, rows: int) -> int:
+        """Byte offset just past the first `rows` lines of the id sidecar."""
+        offset = 0
+        with open(self._path(channel_id, "ids"), "rb") as f:
+            for _ in range(rows):
+                line = f.readline()
+                if not line:
+                    break
+                offset += len(line)
+        return offset
+
+    def _drop(self, channel_id: str):
+        for ext in ("json", "vec", "ids", "scl"):
+            try:
+                os.remove(self._path(channel_id, ext))
+            except FileNotFoundError:
+                pass
+        self._loaded.pop(channel_id, None)
+        self._written.pop(channel_id, None)
+
+    def remove_channel(self, channel_id: str):
+        with self._lock:
+            self._drop(channel_id)
+
+    def rebuild_channel(self, collection, channel_id: str, page_size: int = 5000):
+        """Rewrite a channel's matrix from the collection (appends wait meanwhile)."""
+        with self._lock:
+            self._drop(channel_id)
+            offset = 0
+            while True:
+                page = collection.get(
+                    where={"channel_id": channel_id}, include=["embeddings"], limit=page_size, offset=offset
+                )
+                if len(page["ids"]):
+                    self.add(channel_id, page["ids"], page["embeddings"])
+                if len(page["ids"]) < page_size:
+                    break
+                offset += page_size
+        print(f"[INDEX] Rebuilt vector matrix of {channel_id}: {self.count(channel_id)} videos")
+
+    # -------------------------------
+    # Reads
+    # -------------------------------
+    def count(self, channel_id: str) -> int:
+        return len(self._load(channel_id)[0])
+
+    def _load(self, channel_id: str):
+        """(ids, read-only memmap, int8 scales or None), re-mapped whenever the files grew."""
+        header = self._header(channel_id)
+        if not header or header["dtype"] != self.dtype.name:
+            return [], None, None
+        sizes = self._sizes(channel_id)
+        loaded = self._loaded.get(channel_id)
+        if loaded and loaded[0] == sizes:
+            return loaded[1]
+
+        with open(self._path(channel_id, "ids"), encoding="utf-8") as f:
+            ids = f.read().splitlines()
+        rows = min(len(ids), sizes[0] // (header["dims"] * self.dtype.itemsize))
+        if self.quantized:
+            rows = min(rows, sizes[2] // 4)
+        if rows == 0:
+            return [], None, None
+        matrix = np.memmap(self._path(channel_id, "vec"), dtype=self.dtype, mode="r", shape=(rows, header["dims"]))
+        scales = None
+        if self.quantized:
+            scales = np.fromfile(self._path(channel_id, "scl"), dtype=np.float32, count=rows)
+        self._loaded[channel_id] = (sizes, (ids[:rows], matrix, scales))
+        return ids[:rows], matrix, scales
+
+    def search(self, channel_id: str, embedding, top_k: int, space: str = "l2") -> list:
+        """
+        Nearest neighbours as [(video_id, distance)], closest first; exact up
+        to the matrix's precision. Distances are those of distances().
+        """
+        ids, matrix, scales = self._load(channel_id)
+        if matrix is None:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+
+        scores = np.empty(len(ids), dtype=np.float32)
+        chunk_rows = max(1, SEARCH_CHUNK_BYTES // (4 * matrix.shape[1]))
+        for start in range(0, len(ids), chunk_rows):
+            chunk = np.asarray(matrix[start:start + chunk_rows], dtype=np.float32)
+            if scales is not None:
+                chunk *= scales[start:start + len(chunk), None]
+            scores[start:start + len(chunk)] = distances(chunk, query, space)
+
+        # a rebuild racing a sync can leave a row twice; over-fetch and dedupe
+        k = min(2 * top_k, len(ids))
+        nearest = np.argpartition(scores, k - 1)[:k]
+        nearest = nearest[np.argsort(scores[nearest])]
+        hits = {}
+        for i in nearest:
+            hits.setdefault(ids[i], float(scores[i]))
+        return list(hits.items())[:top_k]
+
+
+def add_records(records: dict):
+    """Append a stored batch (ids, embeddings, metadatas) to each video's channel matrix."""
+    if records.get("embeddings") is None:
+        return
+    per_channel = {}
+    for vid_id, embedding, meta in zip(records["ids"], records["embeddings"], records["metadatas"]):
+        if meta.get("channel_id"):
+            entry = per_channel.setdefault(meta["channel_id"], ([], []))
+            entry[0].append(vid_id)
+            entry[1].append(embedding)
+    store = get_channel_vectors()
+    for channel_id, (ids, embeddings) in per_channel.items():
+        store.add(channel_id, ids, embeddings)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_channel_vectors() -> ChannelVectors:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ChannelVectors()
+        return _store
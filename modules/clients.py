@@ -0,0 +1,42 @@
+# modules/clients.py
+"""
+Process-wide API clients, built on first use.
+
+Importing this module is cheap: the OpenAI SDK is only imported when a client
+is actually requested, and the client (with its HTTP connection pool) is then
+shared by every caller.
+"""
+import asyncio
+import threading
+import weakref
+
+_lock = threading.Lock()
+_openai_client = None
+# async clients hold keep-alive connections bound to the event loop that
+# opened them, so there is one per loop (in practice: Gradio's single loop)
+_async_openai_clients = weakref.WeakKeyDictionary()
+
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                from openai import OpenAI
+
+                _openai_client = OpenAI()
+    return _openai_client
+
+
+def get_async_openai_client():
+    """Shared AsyncOpenAI client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_openai_clients.get(loop)
+    if client is None:
+        with _lock:
+            client = _async_openai_clients.get(loop)
+            if client is None:
+                from openai import AsyncOpenAI
+
+                client = _async_openai_clients[loop] = AsyncOpenAI()
+    return client
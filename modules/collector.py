@@ -2,64 +2,118 @@
 # 1. Collector
 # -------------------------------
 from typing import List, Dict
-from googleapiclient.discovery import build
 
+from modules.metrics import inc
+from modules.sync_state import get_watermark
+from modules.youtube_client import YouTubeClient
 from modules.youtube_utils import get_channel_id
 
-from googleapiclient.discovery import build
 
-
-def fetch_all_channel_videos(api_key: str, channel_url: str, max_results_per_call=50):
-    youtube = build("youtube", "v3", developerKey=api_key)
+def build_youtube(api_key: str) -> YouTubeClient:
+    """Rate-limited, retrying, quota-accounted Data API client."""
+    return YouTubeClient(api_key)
+
+
+def fetch_all_channel_videos(
+    api_key: str,
+    channel_url: str,
+    max_results_per_call=50,
+    delta: bool = False,
+    page_token: str = None,
+    cursor: Dict = None,
+):
+    """
+    Yield (message, videos) per page. With delta=True, paging stops at the
+    channel's stored watermark, so only videos newer than the last sync come back.
+    page_token and cursor are passed on to fetch_channel_videos_by_id.
+    """
+    youtube = build_youtube(api_key)
     channel_id = get_channel_id(youtube, channel_url)
-
-    final_videos = []
-    for videos in fetch_channel_videos_by_id(api_key, channel_id, max_results_per_call):
-        final_videos.extend(videos)
-        print("Fetched", len(final_videos))
-        yield (f"Fetched {len(final_videos)}", videos)  # <-- only yield the *new* batch
-
-    yield (f"Fetched {len(final_videos)}", [])  # final "summary"
-
-
-def fetch_channel_videos_by_id(api_key: str, channel_id: str, max_results=50):
-    youtube = build("youtube", "v3", developerKey=api_key)
+    watermark = get_watermark(channel_id) if delta else None
+
+    # only keep a running count; pages are handed on as they arrive
+    fetched = 0
+    for videos in fetch_channel_videos_by_id(
+        api_key, channel_id, max_results_per_call, watermark=watermark, youtube=youtube,
+        page_token=page_token, cursor=cursor,
+    ):
+        fetched += len(videos)
+        print("Fetched", fetched)
+        yield (f"Fetched {fetched}", videos)  # <-- only yield the *new* batch
+
+    yield (f"Fetched {fetched}", [])  # final "summary"
+
+
+def fetch_channel_videos_by_id(
+    api_key: str,
+    channel_id: str,
+    max_results=50,
+    watermark: Dict = None,
+    youtube: YouTubeClient = None,
+    page_token: str = None,
+    cursor: Dict = None,
+):
+    """
+    Page through a channel's uploads playlist, newest first.
+    If a watermark ({"published_at", "video_ids"}) is given, videos at or
+    behind it are dropped and paging stops on the first page that reaches it.
+    Paging starts at page_token (a checkpoint) if given. A cursor dict gets
+    the token of the page after each yielded one as cursor["next_page_token"]
+    (None after the last page).
+    """
+    youtube = youtube or build_youtube(api_key)
 
     # Get uploads playlist ID
-    channel_response = youtube.channels().list(
-        part="contentDetails,snippet", id=channel_id
-    ).execute()
+    channel_response = youtube.execute(
+        "channels.list",
+        lambda yt: yt.channels().list(part="contentDetails,snippet", id=channel_id),
+    )
 
     channel_title = channel_response["items"][0]["snippet"]["title"]
     uploads_playlist_id = channel_response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
 
-    next_page_token = None
+    next_page_token = page_token
 
     while True:
-        request = youtube.playlistItems().list(
-            part="snippet",
-            playlistId=uploads_playlist_id,
-            maxResults=max_results,
-            pageToken=next_page_token,
+        response = youtube.execute(
+            "playlistItems.list",
+            lambda yt: yt.playlistItems().list(
+                part="snippet",
+                playlistId=uploads_playlist_id,
+                maxResults=max_results,
+                pageToken=next_page_token,
+            ),
         )
-        response = request.execute()
 
         videos = []
+        reached_watermark = False
         for item in response.get("items", []):
             snippet = item["snippet"]
-            videos.append(
-                {
-                    "video_id": snippet["resourceId"]["videoId"],
-                    "title": snippet["title"],
-                    "description": snippet.get("description", ""),
-                    "channel_id": channel_id,
-                    "channel_title": channel_title,
-                }
-            )
-
+            video = {
+                "video_id": snippet["resourceId"]["videoId"],
+                "title": snippet["title"],
+                "description": snippet.get("description", ""),
+                "published_at": snippet.get("publishedAt", ""),
+                "channel_id": channel_id,
+                "channel_title": channel_title,
+            }
+            if watermark and _behind_watermark(video, watermark):
+                reached_watermark = True
+                continue
+            videos.append(video)
+
+        inc("youtube_videos_fetched_total", len(videos), help_text="Videos returned by playlistItems pages")
+        next_page_token = None if reached_watermark else response.get("nextPageToken")
+        if cursor is not None:
+            cursor["next_page_token"] = next_page_token
         yield videos  # yield one page worth
 
-        next_page_token = response.get("nextPageToken")
         if not next_page_token:
             break
 
+
+def _behind_watermark(video: Dict, watermark: Dict) -> bool:
+    if video["video_id"] in watermark["video_ids"]:
+        return True
+    return bool(video["published_at"]) and video["published_at"] < watermark["published_at"]
+
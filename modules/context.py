@@ -0,0 +1,140 @@
+# modules/context.py
+"""
+Context compaction for the answer prompt.
+
+Video descriptions are often kilobytes of link lists, hashtags and channel
+boilerplate. Before they go into the prompt, each description is cut down to
+the passages that share the most terms with the question, and the whole
+context is held to a token budget. Lines learned as the channel's
+boilerplate (modules/boilerplate.py) are removed first. Titles are always
+kept, so no retrieved video is dropped unless even the titles overflow the
+budget.
+"""
+import os
+import re
+
+from modules.boilerplate import strip_boilerplate
+from modules.embeddings import _truncate_to_tokens, estimate_tokens
+from modules.lexical_index import tokenize
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_TOKENS_PER_VIDEO = int(os.getenv("CONTEXT_TOKENS_PER_VIDEO", "150"))
+MIN_TOKENS_PER_VIDEO = 20
+
+# links, hashtags and @handles carry no meaning for the answer
+_NOISE = re.compile(r"https?://\S+|www\.\S+|[#@]\w+")
+_PASSAGE_SPLIT = re.compile(r"\n+|(?<=[.!?।])\s+")
+_MIN_WORDS_NEXT_TO_LINK = 3  # "Instagram: <link>" rows are dropped, sentences with a link kept
+
+
+def split_passages(text: str) -> list[str]:
+    passages = []
+    for raw in _PASSAGE_SPLIT.split(text or ""):
+        passage = " ".join(_NOISE.sub("", raw).split())
+        words = [t for t in tokenize(passage) if not t.isdigit()]
+        had_noise = passage != " ".join(raw.split())
+        if words and (len(words) >= _MIN_WORDS_NEXT_TO_LINK or not had_noise):
+            passages.append(passage)
+    return passages
+
+
+def trim_description(query_terms: set, text: str, max_tokens: int) -> str:
+    """
+    Keep the opening passage (usually the summary) and the passages that
+    share terms with the query, most overlap first, in their original order
+    and within max_tokens. Repeated passages are kept once.
+    """
+    passages = list(dict.fromkeys(split_passages(text)))
+    overlap = [len(query_terms & set(tokenize(p))) for p in passages]
+    candidates = sorted(
+        (i for i in range(len(passages)) if i == 0 or overlap[i]),
+        key=lambda i: (-overlap[i], i),
+    )
+    chosen, used = [], 0
+    for i in candidates:
+        tokens = estimate_tokens(passages[i])
+        if used + tokens > max_tokens:
+            if not chosen:
+                chosen.append(i)
+                passages[i] = _truncate_to_tokens(passages[i], max_tokens) + " …"
+                used = max_tokens
+            continue
+        chosen.append(i)
+        used += tokens
+
+    parts, previous = [], None
+    for i in sorted(chosen):
+        if previous is not None and i != previous + 1:
+            parts.append("…")
+        parts.append(passages[i])
+        previous = i
+    return " ".join(parts)
+
+
+def _video_line(video: dict, description: str) -> str:
+    return (
+        f"- {video['title']} ({video['channel']}) (https://youtube.com/watch?v={video['video_id']})"
+        f"\n  description: {description}"
+    )
+
+
+def _as_video(result: dict) -> dict:
+    title = result.get("video_title") or result.get("title", "")
+    description = result.get("description", "")
+    # stored documents are "title - description"; the title is on the line already
+    if title and description.startswith(title + " - "):
+        description = description[len(title) + 3:]
+    return {
+        "video_id": result.get("video_id", ""),
+        "title": title,
+        "channel": result.get("channel") or result.get("channel_title", ""),
+        "description": description,
+        "stripped": strip_boilerplate(result.get("channel_id"), description),
+    }
+
+
+def compact_context(
+    query: str,
+    results: list,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    per_video: int = CONTEXT_TOKENS_PER_VIDEO,
+) -> tuple[str, dict]:
+    """
+    Returns (context text, {"videos", "kept_videos", "tokens_before",
+    "tokens_boilerplate", "tokens_after"}); tokens_boilerplate is what
+    stripping channel boilerplate alone saved.
+    """
+    results = [r for r in results if isinstance(r, dict)]
+    videos = [_as_video(r) for r in results]
+    # what the prompt used to carry: every full stored document
+    tokens_before = estimate_tokens(
+        "\n".join(_video_line(v, r.get("description", "")) for v, r in zip(videos, results))
+    )
+    tokens_boilerplate = sum(
+        estimate_tokens(v["description"]) - estimate_tokens(v["stripped"])
+        for v in videos
+        if v["stripped"] != v["description"]
+    )
+
+    # headers (title, channel, link) always go in; drop the lowest-ranked
+    # videos only if even those do not fit
+    headers = [estimate_tokens(_video_line(v, "")) for v in videos]
+    while videos and sum(headers) + MIN_TOKENS_PER_VIDEO * len(videos) > budget:
+        videos.pop()
+        headers.pop()
+
+    query_terms = set(tokenize(query))
+    allowance = per_video
+    if videos:
+        allowance = max(MIN_TOKENS_PER_VIDEO, min(per_video, (budget - sum(headers)) // len(videos)))
+    lines = [_video_line(v, trim_description(query_terms, v["stripped"], allowance)) for v in videos]
+    context_text = "\n".join(lines)
+
+    report = {
+        "videos": len(results),
+        "kept_videos": len(videos),
+        "tokens_before": tokens_before,
+        "tokens_boilerplate": tokens_boilerplate,
+        "tokens_after": estimate_tokens(context_text) if context_text else 0,
+    }
+    return context_text, report
@@ -1,45 +1,127 @@
-import chromadb
-
+import os
+import threading
 
-def get_client():
-    client = chromadb.PersistentClient(path="./youtube_db")
-    return client
+import chromadb
+from chromadb.config import Settings
 
+from modules.boilerplate import forget
+from modules.cache import bump_data_version
+from modules.channel_vectors import CHANNEL_VECTORS_ENABLED, get_channel_vectors
+from modules.lexical_index import LEXICAL_INDEX_ENABLED, get_lexical_index
+from modules.metrics import register_collector
+from modules.registry import list_channels, rebuild_registry, remove_channel
+from modules.sync_state import clear_watermark
 
-def get_collection():
-    client = get_client()
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./youtube_db")
+CHROMA_COLLECTION = os.getenv("CHROMA_COLLECTION", "yt_metadata")
+CHROMA_TELEMETRY = os.getenv("CHROMA_TELEMETRY", "0") == "1"
 
-    # Ensure fresh collection with correct dimension
-    try:
-        collection = client.get_collection("yt_metadata")
-    except Exception:
-        collection = client.create_collection("yt_metadata")
+# -------------------------------
+# Process-wide client + collection pool
+# -------------------------------
+_pool_lock = threading.RLock()
+_client = None
+_collections = {}
+_pool_stats = {
+    "clients_created": 0,
+    "client_reuses": 0,
+    "collections_opened": 0,
+    "collection_reuses": 0,
+}
 
-    # # Check dimension mismatch
-    # try:
-    #     # quick test query
-    #     collection.query(query_embeddings=[[0.0] * 1536], n_results=1)
-    # except Exception:
-    #     # Delete and recreate with fresh schema
-    #     client.delete_collection("yt_metadata")
-    #     collection = client.create_collection("yt_metadata")
 
-    return collection
+def get_client():
+    """One PersistentClient per process; every caller shares it."""
+    global _client
+    with _pool_lock:
+        if _client is None:
+            _client = chromadb.PersistentClient(
+                path=CHROMA_PATH,
+                settings=Settings(anonymized_telemetry=CHROMA_TELEMETRY),
+            )
+            _pool_stats["clients_created"] += 1
+        else:
+            _pool_stats["client_reuses"] += 1
+        return _client
+
+
+def get_collection(name: str = CHROMA_COLLECTION):
+    with _pool_lock:
+        collection = _collections.get(name)
+        if collection is not None:
+            _pool_stats["collection_reuses"] += 1
+            return collection
+
+        client = get_client()
+
+        # Ensure fresh collection with correct dimension
+        try:
+            collection = client.get_collection(name)
+        except Exception:
+            collection = client.create_collection(name)
+        _collections[name] = collection
+        _pool_stats["collections_opened"] += 1
+
+        # # Check dimension mismatch
+        # try:
+        #     # quick test query
+        #     collection.query(query_embeddings=[[0.0] * 1536], n_results=1)
+        # except Exception:
+        #     # Delete and recreate with fresh schema
+        #     client.delete_collection("yt_metadata")
+        #     collection = client.create_collection("yt_metadata")
+
+        return collection
+
+
+def get_pool_stats() -> dict:
+    with _pool_lock:
+        return dict(_pool_stats)
+
+
+_POOL_METRICS = {
+    "clients_created": ("chroma_clients_created_total", "Chroma clients created"),
+    "client_reuses": ("chroma_client_reuses_total", "Calls served by the shared Chroma client"),
+    "collections_opened": ("chroma_collections_opened_total", "Chroma collections opened"),
+    "collection_reuses": ("chroma_collection_reuses_total", "Calls served by a cached collection handle"),
+}
+
+
+def _pool_samples() -> list:
+    """get_pool_stats as Prometheus samples (read on every /metrics scrape)."""
+    stats = get_pool_stats()
+    samples = [(name, "counter", help_text, {}, stats[key]) for key, (name, help_text) in _POOL_METRICS.items()]
+    with _pool_lock:
+        samples.append(("chroma_open_collections", "gauge", "Collection handles held by the pool", {}, len(_collections)))
+    return samples
+
+
+register_collector(_pool_samples)
+
+
+def reset_pool():
+    """Forget the shared client and collection handles (tests/benchmarks)."""
+    global _client
+    with _pool_lock:
+        _client = None
+        _collections.clear()
 
 
 # modules/db.py
-def get_indexed_channels(collection=get_collection()):
-    results = collection.get(include=["metadatas"])
-    channels = {}
-
-    for meta in results["metadatas"]:
-        cid = meta.get("channel_id")  # ✅ safe
-        cname = meta.get("channel_title", "Unknown Channel")
+def get_indexed_channels(collection=None):
+    """channel_id -> channel title, served from the channel registry."""
+    channels = list_channels()
+
+    # DB indexed before the registry existed: backfill it once
+    if not channels:
+        if collection is None:
+            collection = get_collection()
+        if collection.count() > 0:
+            rebuild_registry(collection)
+            channels = list_channels()
 
-        if cid:  # only include if we have a channel_id
-            channels[cid] = cname
     # print("channels= ",channels)
-    return channels
+    return {c["channel_id"]: c["channel_title"] for c in channels}
 
 
 # -------------------------------
@@ -52,6 +134,15 @@ def delete_channel_from_collection(channel_id: str):
 
     # print("data = ", data)
     get_collection().delete(where={"channel_id": channel_id})
+    remove_channel(channel_id)
+    if LEXICAL_INDEX_ENABLED:
+        get_lexical_index().remove_channel(channel_id)
+    if CHANNEL_VECTORS_ENABLED:
+        get_channel_vectors().remove_channel(channel_id)
+    forget(channel_id)
+    bump_data_version([channel_id])
+    # a re-added channel must be fetched in full again
+    clear_watermark(channel_id)
 
 
 def fetch_channel_data(channel_id: str):
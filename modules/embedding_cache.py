@@ -0,0 +1,159 @@
+# modules/embedding_cache.py
+"""
+Disk-backed, content-addressed embedding cache.
+
+Entries are keyed by (model name, dimensions, sha256 of the embedded text), so
+a title/description that has not changed is never embedded twice, and the
+same boilerplate text shared by several channels is embedded once.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", "./youtube_db/embedding_cache.sqlite3"
+)
+EMBEDDING_CACHE_MAX_BYTES = int(
+    os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))
+)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "0"
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_sha TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, text_sha)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def get_many(self, model: str, dimensions: int, texts: list[str]) -> list:
+        """Return cached vectors in input order, None where missing."""
+        keys = [text_key(t) for t in texts]
+        found = {}
+        with self._lock:
+            # stay well below sqlite's bound-parameter limit
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                rows = self._conn.execute(
+                    f"""
+                    SELECT text_sha, vector FROM embeddings
+                    WHERE model = ? AND dimensions = ?
+                    AND text_sha IN ({",".join("?" * len(chunk))})
+                    """,
+                    [model, dimensions, *chunk],
+                ).fetchall()
+                for sha, blob in rows:
+                    found[sha] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_sha = ?",
+                    [(now, model, dimensions, sha) for sha in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(k) for k in keys]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, dimensions: int, texts: list[str], vectors: list):
+        now = time.time()
+        rows = [
+            (model, dimensions, text_key(t), array("f", v).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            for row in rows:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?, ?)", row
+                )
+                if cur.rowcount:
+                    self._size += len(row[3])
+            self._conn.commit()
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until we are under 90% of the cap."""
+        target = int(self.max_bytes * 0.9)
+        while self._size > target:
+            rows = self._conn.execute(
+                """
+                SELECT model, dimensions, text_sha, LENGTH(vector) FROM embeddings
+                ORDER BY last_used LIMIT 1000
+                """
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                break
+            removed = []
+            for model, dims, sha, size in rows:
+                removed.append((model, dims, sha))
+                self._size -= size
+                self.evictions += 1
+                if self._size <= target:
+                    break
+            self._conn.executemany(
+                "DELETE FROM embeddings WHERE model = ? AND dimensions = ? AND text_sha = ?",
+                removed,
+            )
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
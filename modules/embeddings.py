@@ -1,31 +1,253 @@
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
+import asyncio
+import os
+import threading
 from dotenv import load_dotenv
 load_dotenv()
 
+from modules.clients import get_async_openai_client, get_openai_client
+from modules.embedding_cache import EMBEDDING_CACHE_ENABLED, get_embedding_cache
+from modules.metrics import SIZE_BUCKETS, TOKEN_BUCKETS, inc, observe, span
 
-# Step 1: Load SentenceTransformer model
-# Old MiniLM version:
-# model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
 
-# Better MPNet alternative:
-model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
-client = OpenAI()    
+HF_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+HF_EMBEDDING_DIMENSIONS = 768
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-large"
+OPENAI_EMBEDDING_DIMENSIONS = 3072
 
-def _get_hf_embedding(text: str) -> list:
-    return model.encode(text).tolist()
+# Provider limits: OpenAI accepts at most 2048 inputs and 300k tokens per
+# embeddings request, and 8191 tokens per input. We stay a bit below the
+# request budget because token counts are only estimated.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+# Shorter vectors (Matryoshka truncation): text-embedding-3 models return the
+# first N dimensions re-normalised when asked for dimensions=N; other models
+# are cut and re-normalised here. Unset = the model's full size. Changing it
+# needs a re-index, like switching backends.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+MAX_INPUTS_PER_REQUEST = int(os.getenv("EMBEDDING_MAX_INPUTS_PER_REQUEST", "2048"))
+MAX_TOKENS_PER_REQUEST = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_REQUEST", "250000"))
+MAX_TOKENS_PER_INPUT = 8191
 
-def _get_openai_embedding(text: str) -> list:
-    response = client.embeddings.create(
-        model="text-embedding-3-large",  # or "text-embedding-3-large"
-        input=text
+_model = None
+_model_lock = threading.Lock()
+
+
+def _get_model():
+    """
+    Load the SentenceTransformer model on first use; importing
+    sentence_transformers pulls in torch, which is slow and only needed by
+    the "hf" backend.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+
+                # Old MiniLM version:
+                # SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+
+                # Better MPNet alternative:
+                _model = SentenceTransformer(HF_EMBEDDING_MODEL)
+    return _model
+
+
+# -------------------------------
+# Token estimation + request packing
+# -------------------------------
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap, conservative token estimate.
+    English averages ~4 bytes per token, Tamil/Devanagari text is 3 bytes per
+    character and tokenizes at roughly one token per character, so
+    utf-8 bytes / 3 errs on the high side for both.
+    """
+    return max(1, -(-len(text.encode("utf-8")) // 3))
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text.encode("utf-8")[: max_tokens * 3].decode("utf-8", errors="ignore")
+
+
+def pack_batches(
+    texts: list[str],
+    max_tokens: int = MAX_TOKENS_PER_REQUEST,
+    max_inputs: int = MAX_INPUTS_PER_REQUEST,
+) -> list[list[int]]:
+    """
+    Group text indices into request-sized batches, keeping input order and
+    staying under both the per-request token and input-count limits.
+    """
+    batches, current, current_tokens = [], [], 0
+    for idx, text in enumerate(texts):
+        tokens = min(estimate_tokens(text), MAX_TOKENS_PER_INPUT)
+        if current and (
+            current_tokens + tokens > max_tokens or len(current) >= max_inputs
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+def truncate_embedding(vector, dimensions: int) -> list[float]:
+    """First `dimensions` values, re-normalised to unit length."""
+    head = list(vector[:dimensions])
+    norm = sum(v * v for v in head) ** 0.5 or 1.0
+    return [v / norm for v in head]
+
+
+def _get_hf_embeddings(texts: list[str]) -> list[list[float]]:
+    vectors = _get_model().encode(texts).tolist()
+    _, dimensions = embedding_profile()
+    if dimensions < HF_EMBEDDING_DIMENSIONS:
+        vectors = [truncate_embedding(v, dimensions) for v in vectors]
+    return vectors
+
+
+def _openai_dimensions_arg() -> dict:
+    _, dimensions = embedding_profile()
+    # only send `dimensions` when asking for less, so full-size requests stay unchanged
+    return {"dimensions": dimensions} if dimensions < OPENAI_EMBEDDING_DIMENSIONS else {}
+
+
+def _get_openai_embeddings(texts: list[str]) -> list[list[float]]:
+    response = get_openai_client().embeddings.create(
+        model=OPENAI_EMBEDDING_MODEL,
+        input=texts,
+        **_openai_dimensions_arg(),
     )
-    return response.data[0].embedding
+    # the API documents `index` on each item; don't rely on response order
+    return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+
+async def _aget_openai_embeddings(texts: list[str]) -> list[list[float]]:
+    response = await get_async_openai_client().embeddings.create(
+        model=OPENAI_EMBEDDING_MODEL,
+        input=texts,
+        **_openai_dimensions_arg(),
+    )
+    return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+
+# backend name -> (embed function, model name, dimensions)
+EMBEDDING_BACKENDS = {
+    "hf": (_get_hf_embeddings, HF_EMBEDDING_MODEL, HF_EMBEDDING_DIMENSIONS),
+    "openai": (_get_openai_embeddings, OPENAI_EMBEDDING_MODEL, OPENAI_EMBEDDING_DIMENSIONS),
+}
+# backends with a native async client; the others run in a worker thread
+ASYNC_EMBEDDING_BACKENDS = {
+    "openai": _aget_openai_embeddings,
+}
+
+
+def embedding_profile() -> tuple[str, int]:
+    """(model name, dimensions) of the active backend, after EMBEDDING_DIMENSIONS."""
+    _, model_name, dimensions = EMBEDDING_BACKENDS[EMBEDDING_BACKEND]
+    if EMBEDDING_DIMENSIONS:
+        dimensions = min(dimensions, EMBEDDING_DIMENSIONS)
+    return model_name, dimensions
+
+
+def _observe_batch(texts: list[str]):
+    observe("embedding_batch_inputs", len(texts), SIZE_BUCKETS, help_text="Inputs per embedding request")
+    observe(
+        "embedding_batch_tokens",
+        sum(estimate_tokens(t) for t in texts),
+        TOKEN_BUCKETS,
+        help_text="Estimated tokens per embedding request",
+    )
+
+
+def _embed_uncached(texts: list[str]) -> list[list]:
+    backend = EMBEDDING_BACKENDS[EMBEDDING_BACKEND][0]
+    embeddings = []
+    for batch in pack_batches(texts):
+        batch_texts = [texts[i] for i in batch]
+        _observe_batch(batch_texts)
+        with span("embedding_request", backend=EMBEDDING_BACKEND):
+            embeddings.extend(backend(batch_texts))
+    return embeddings
+
+
+def _count_cache_lookups(embeddings: list):
+    hits = sum(e is not None for e in embeddings)
+    inc("embedding_cache_hits_total", hits, help_text="Texts served from the embedding cache")
+    inc("embedding_cache_misses_total", len(embeddings) - hits, help_text="Texts that needed embedding")
+
+
+def get_embeddings(texts: list[str]) -> list[list]:
+    """
+    Embed many texts with as few backend requests as possible.
+    Texts already in the embedding cache are not sent, duplicates are sent
+    once, and the rest are packed by estimated token count.
+    The result is in input order.
+    """
+    if not texts:
+        return []
+
+    texts = [_truncate_to_tokens(t, MAX_TOKENS_PER_INPUT) for t in texts]
+    if not EMBEDDING_CACHE_ENABLED:
+        return _embed_uncached(texts)
+
+    model_name, dimensions = embedding_profile()
+    cache = get_embedding_cache()
+    embeddings = cache.get_many(model_name, dimensions, texts)
+    _count_cache_lookups(embeddings)
+
+    missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+    if missing:
+        fresh = dict(zip(missing, _embed_uncached(missing)))
+        cache.put_many(model_name, dimensions, missing, [fresh[t] for t in missing])
+        embeddings = [e if e is not None else fresh[t] for t, e in zip(texts, embeddings)]
+    return embeddings
 
 
 def get_embedding(text: str) -> list:
     """
-    Switch according to the embedding model you want.
+    Switch according to the embedding model you want (EMBEDDING_BACKEND).
     """
-    # return _get_hf_embedding(text)
-    return _get_openai_embedding(text)
\ No newline at end of file
+    return get_embeddings([text])[0]
+
+
+async def aget_embeddings(texts: list[str]) -> list[list]:
+    """Async get_embeddings: same caching and packing, non-blocking requests."""
+    backend = ASYNC_EMBEDDING_BACKENDS.get(EMBEDDING_BACKEND)
+    if backend is None or not texts:
+        return await asyncio.to_thread(get_embeddings, texts)
+
+    texts = [_truncate_to_tokens(t, MAX_TOKENS_PER_INPUT) for t in texts]
+    model_name, dimensions = embedding_profile()
+    cache = get_embedding_cache() if EMBEDDING_CACHE_ENABLED else None
+    if cache is not None:
+        embeddings = await asyncio.to_thread(cache.get_many, model_name, dimensions, texts)
+        _count_cache_lookups(embeddings)
+    else:
+        embeddings = [None] * len(texts)
+
+    missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+    if missing:
+        fresh = []
+        for batch in pack_batches(missing):
+            batch_texts = [missing[i] for i in batch]
+            _observe_batch(batch_texts)
+            with span("embedding_request", backend=EMBEDDING_BACKEND):
+                fresh.extend(await backend(batch_texts))
+        fresh = dict(zip(missing, fresh))
+        if cache is not None:
+            await asyncio.to_thread(
+                cache.put_many, model_name, dimensions, missing, [fresh[t] for t in missing]
+            )
+        embeddings = [e if e is not None else fresh[t] for t, e in zip(texts, embeddings)]
+    return embeddings
+
+
+async def aget_embedding(text: str) -> list:
+    return (await aget_embeddings([text]))[0]
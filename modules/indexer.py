@@ -1,12 +1,150 @@
 # modules/indexer.py
 from typing import Dict, List
-from openai import OpenAI
 
-from modules.embeddings import get_embedding
+from modules.boilerplate import learn, record_stored, strip_boilerplate
+from modules.cache import bump_data_version
+from modules.channel_vectors import CHANNEL_VECTORS_ENABLED, add_records
+from modules.embeddings import get_embeddings
+from modules.lexical_index import LEXICAL_INDEX_ENABLED, get_lexical_index
+from modules.metrics import SIZE_BUCKETS, inc, observe, span
+from modules.registry import allocate_seq, record_indexed
 
-def index_videos(videos: List[Dict], collection, channel_url: str, batch_size: int = 50):
-    client = OpenAI()
 
+# -------------------------------
+# Stages: build → strip → embed → store
+# Used together by index_videos, and separately by the streaming
+# sync pipeline in youtube_sync.py.
+# -------------------------------
+def build_records(videos: List[Dict], channel_url: str) -> Dict:
+    """Turn fetched videos into Chroma-ready documents, metadatas and ids."""
+    # Prepare text inputs
+    documents = [f"{vid.get('title', '')} - {vid.get('description', '')}" for vid in videos]
+
+    # Build metadata + ids
+    metadatas, ids = [], []
+    for vid in videos:
+        metadata = {
+            "video_id": vid.get("video_id"),
+            "video_title": vid.get("title", ""),
+            "description": vid.get("description", ""),
+            "channel_url": channel_url,
+        }
+        if "channel_id" in vid:
+            metadata["channel_id"] = vid["channel_id"]
+        if "channel_title" in vid:
+            metadata["channel_title"] = vid["channel_title"]
+        if vid.get("published_at"):
+            metadata["published_at"] = vid["published_at"]
+
+        metadatas.append(metadata)
+        ids.append(vid.get("video_id"))
+
+    return {"ids": ids, "documents": documents, "metadatas": metadatas}
+
+
+def drop_existing(collection, records: Dict) -> Dict:
+    """
+    Remove records whose ids are already stored (an id-only lookup), so we
+    neither embed nor re-add videos we already hold.
+    """
+    if not records["ids"]:
+        return records
+    with span("chroma_get", purpose="existing_ids"):
+        existing = set(collection.get(ids=records["ids"], include=[])["ids"])
+    if not existing:
+        return records
+    keep = [i for i, vid_id in enumerate(records["ids"]) if vid_id not in existing]
+    return {key: [values[i] for i in keep] for key, values in records.items()}
+
+
+def strip_records(records: Dict) -> Dict:
+    """
+    Learn the channels' recurring footer lines from these (new) videos, then
+    leave them out of the documents we embed and store; metadata keeps the
+    full description. Run once per batch, after drop_existing: already
+    stored videos or a repeated call would be counted twice.
+    """
+    per_channel = {}
+    for meta in records["metadatas"]:
+        per_channel.setdefault(meta.get("channel_id"), []).append(meta.get("description", ""))
+    for channel_id, descriptions in per_channel.items():
+        learn(channel_id, descriptions)
+    documents = []
+    for meta in records["metadatas"]:
+        description = strip_boilerplate(meta.get("channel_id"), meta.get("description", ""))
+        documents.append(f"{meta.get('video_title', '')} - {description}")
+    records["documents"] = documents
+    return records
+
+
+def embed_records(records: Dict) -> Dict:
+    # One round trip per batch instead of one per video
+    records["embeddings"] = get_embeddings(records["documents"])
+    return records
+
+
+def _assign_seq(metadatas: List[Dict]):
+    """
+    Number new videos per channel so listings can page by seq range. Videos
+    numbered by an earlier attempt keep their seq, so a retried store does
+    not burn numbers.
+    """
+    per_channel = {}
+    for meta in metadatas:
+        if meta.get("channel_id") and "seq" not in meta:
+            per_channel.setdefault(meta["channel_id"], []).append(meta)
+    for channel_id, metas in per_channel.items():
+        first = allocate_seq(channel_id, len(metas))
+        for i, meta in enumerate(metas):
+            meta["seq"] = first + i
+
+
+def store_records(collection, records: Dict, done: set = None) -> int:
+    """
+    Add embedded records to the collection and the bookkeeping around it
+    (channel matrices, registry, lexical index). To retry a failed store,
+    pass the same records and `done` set again: steps that completed are
+    skipped, and videos the failed Chroma add did store are not added twice.
+    """
+    if not records["ids"]:
+        return 0
+    done = set() if done is None else done
+
+    # numbers stick to the metadata, so a retry reuses them
+    _assign_seq(records["metadatas"])
+
+    if "chroma" not in done:
+        pending = drop_existing(collection, records) if "chroma_tried" in done else records
+        done.add("chroma_tried")
+        # Insert in bulk
+        if pending["ids"]:
+            observe("chroma_add_batch_size", len(pending["ids"]), SIZE_BUCKETS, help_text="Videos per Chroma add")
+            with span("chroma_add"):
+                collection.add(
+                    documents=pending["documents"],
+                    embeddings=pending.get("embeddings"),
+                    metadatas=pending["metadatas"],
+                    ids=pending["ids"],
+                )
+            inc("videos_indexed_total", len(pending["ids"]), help_text="Videos stored in the collection")
+        done.add("chroma")
+    # before the registry count goes up, so a channel's matrix never looks stale mid-sync
+    if CHANNEL_VECTORS_ENABLED and "vectors" not in done:
+        add_records(records)
+        done.add("vectors")
+    if "registry" not in done:
+        record_indexed(records["metadatas"])
+        done.add("registry")
+    if "boilerplate" not in done:
+        record_stored(records["metadatas"], records["documents"])
+        done.add("boilerplate")
+    if LEXICAL_INDEX_ENABLED:
+        get_lexical_index().add_documents(records["ids"], records["documents"], records["metadatas"])
+    bump_data_version({m["channel_id"] for m in records["metadatas"] if m.get("channel_id")})
+    return len(records["ids"])
+
+
+def index_videos(videos: List[Dict], collection, channel_url: str, batch_size: int = 50):
     total = len(videos)
     print(f"[INDEX] Starting indexing for {total} videos (channel={channel_url})")
 
@@ -18,38 +156,10 @@ def index_videos(videos: List[Dict], collection, channel_url: str, batch_size: i
 
         print(f"[INDEX] Processing batch {start+1} → {end} of {total} — {percent}%")
 
-        # Prepare text inputs
-        texts = [f"{vid.get('title', '')} - {vid.get('description', '')}" for vid in batch]
-
-        embeddings = [get_embedding(text) for text in texts]
-
-        # Build metadata + ids
-        metadatas, ids = [], []
-        for vid in batch:
-            metadata = {
-                "video_id": vid.get("video_id"),
-                "video_title": vid.get("title", ""),
-                "description": vid.get("description", ""),
-                "channel_url": channel_url,
-            }
-            if "channel_id" in vid:
-                metadata["channel_id"] = vid["channel_id"]
-            if "channel_title" in vid:
-                metadata["channel_title"] = vid["channel_title"]
-
-            metadatas.append(metadata)
-            ids.append(vid.get("video_id"))
-
-        # Insert in bulk
-        collection.add(
-            documents=texts,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids,
-        )
+        records = embed_records(strip_records(drop_existing(collection, build_records(batch, channel_url))))
+        store_records(collection, records)
 
         print(f"[INDEX] ✅ Indexed {len(batch)} videos (total so far: {end}/{total} — {percent}%)")
 
     print(f"[INDEX] 🎉 Finished indexing {total} videos for channel={channel_url}")
     return total
-
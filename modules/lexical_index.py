@@ -0,0 +1,261 @@
+# modules/lexical_index.py
+"""
+On-disk BM25 inverted index over video titles and descriptions.
+
+Exact names ("Poorvikalyani", "chathusloki") are matched far better by terms
+than by vectors, and a lexical lookup needs no embedding request. The
+indexer adds every stored video here and channel deletes remove them; the
+retriever fuses these hits with the vector results (see modules/retriever.py).
+
+Tokens are runs of Unicode letters, digits and combining marks, so Tamil and
+Devanagari words keep their vowel signs instead of being split on them.
+"""
+import math
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "./youtube_db/lexical_index.sqlite3")
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "1") != "0"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# terms in more than this share of all videos are skipped when the query has
+# rarer terms; they barely change the ranking but can have huge posting lists
+MAX_DF_RATIO = 0.5
+# a query term is "distinctive" when at most this share of videos contain it
+FAST_PATH_MAX_DF_RATIO = float(os.getenv("LEXICAL_FAST_PATH_MAX_DF_RATIO", "0.02"))
+
+
+def tokenize(text: str) -> list[str]:
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    tokens, current = [], []
+    for ch in text:
+        # L = letters, N = digits, M = combining marks (Indic vowel signs, viramas)
+        if unicodedata.category(ch)[0] in "LNM":
+            current.append(ch)
+        elif current:
+            tokens.append("".join(current))
+            current = []
+    if current:
+        tokens.append("".join(current))
+    return tokens
+
+
+class LexicalIndex:
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id TEXT PRIMARY KEY,
+                channel_id TEXT,
+                video_title TEXT,
+                channel_title TEXT,
+                document TEXT,
+                length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS docs_channel ON docs (channel_id);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                in_title INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+            """
+        )
+        self._conn.commit()
+        self._doc_count, self._total_length = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs"
+        ).fetchone()
+
+    # -------------------------------
+    # Writes
+    # -------------------------------
+    def _delete_docs(self, doc_ids):
+        for doc_id in doc_ids:
+            row = self._conn.execute("SELECT length FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row is None:
+                continue
+            self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+            self._doc_count -= 1
+            self._total_length -= row[0]
+
+    def add_documents(self, ids: list, documents: list, metadatas: list):
+        """Index stored videos (re-adding an id replaces its entry)."""
+        with self._lock:
+            try:
+                self._delete_docs(ids)
+                for doc_id, document, meta in zip(ids, documents, metadatas):
+                    title_terms = tokenize(meta.get("video_title", ""))
+                    terms = Counter(title_terms + tokenize(meta.get("description", "")))
+                    title_set = set(title_terms)
+                    self._conn.execute(
+                        "INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            doc_id,
+                            meta.get("channel_id"),
+                            meta.get("video_title", ""),
+                            meta.get("channel_title", ""),
+                            document,
+                            sum(terms.values()),
+                        ),
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO postings VALUES (?, ?, ?, ?)",
+                        [(t, doc_id, tf, int(t in title_set)) for t, tf in terms.items()],
+                    )
+                    self._doc_count += 1
+                    self._total_length += sum(terms.values())
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                self._reload_stats()
+                raise
+
+    def remove_channel(self, channel_id: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM postings WHERE doc_id IN (SELECT doc_id FROM docs WHERE channel_id = ?)",
+                (channel_id,),
+            )
+            self._conn.execute("DELETE FROM docs WHERE channel_id = ?", (channel_id,))
+            self._conn.commit()
+            self._reload_stats()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.commit()
+            self._reload_stats()
+
+    def _reload_stats(self):
+        self._doc_count, self._total_length = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs"
+        ).fetchone()
+
+    @property
+    def doc_count(self) -> int:
+        return self._doc_count
+
+    # -------------------------------
+    # Queries
+    # -------------------------------
+    def _score(self, query: str, channel_id: str = None):
+        """
+        BM25 over the query's terms. Returns ({doc_id: [score, title terms]},
+        the distinct query terms, {term: df}).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._doc_count:
+            return {}, terms, {}
+
+        n = self._doc_count
+        avgdl = self._total_length / n or 1.0
+        df = {
+            t: self._conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (t,)).fetchone()[0]
+            for t in terms
+        }
+        scored_terms = [t for t in terms if df[t] and df[t] <= MAX_DF_RATIO * n]
+        if not scored_terms:
+            scored_terms = [t for t in terms if df[t]]
+
+        channel_filter = " AND d.channel_id = ?" if channel_id else ""
+        docs = {}
+        for t in scored_terms:
+            idf = math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+            rows = self._conn.execute(
+                f"""
+                SELECT p.doc_id, p.tf, p.in_title, d.length FROM postings p
+                JOIN docs d ON d.doc_id = p.doc_id
+                WHERE p.term = ?{channel_filter}
+                """,
+                (t, channel_id) if channel_id else (t,),
+            ).fetchall()
+            for doc_id, tf, in_title, length in rows:
+                entry = docs.setdefault(doc_id, [0.0, set()])
+                entry[0] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl))
+                if in_title:
+                    entry[1].add(t)
+        return docs, terms, df
+
+    def _hits(self, ranked) -> list[dict]:
+        hits = []
+        for doc_id, score in ranked:
+            row = self._conn.execute(
+                "SELECT video_title, channel_title, document, channel_id FROM docs WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+            hits.append(
+                {
+                    "video_id": doc_id,
+                    "video_title": row[0],
+                    "channel": row[1] or "",
+                    "channel_id": row[3] or "",
+                    "description": row[2],
+                    "bm25": round(score, 4),
+                }
+            )
+        return hits
+
+    def search(self, query: str, channel_id: str = None, limit: int = 10) -> list[dict]:
+        """Top videos by BM25, best first."""
+        with self._lock:
+            docs, _, _ = self._score(query, channel_id)
+            ranked = sorted(((d, e[0]) for d, e in docs.items()), key=lambda x: -x[1])[:limit]
+            return self._hits(ranked)
+
+    def confident_hits(self, query: str, channel_id: str = None, limit: int = 10) -> list[dict]:
+        """
+        Hits good enough to answer without vector search, or [] when the
+        query is not a keyword lookup. Confident means: most query terms are
+        distinctive (rare across the index), and the returned videos carry
+        every distinctive term in their title.
+        """
+        with self._lock:
+            docs, terms, df = self._score(query, channel_id)
+            if not docs:
+                return []
+            max_df = max(1.0, FAST_PATH_MAX_DF_RATIO * self._doc_count)
+            distinctive = {t for t in terms if 0 < df[t] <= max_df}
+            if not distinctive or 2 * len(distinctive) < len(terms):
+                return []
+            ranked = sorted(
+                ((d, e[0]) for d, e in docs.items() if distinctive <= e[1]), key=lambda x: -x[1]
+            )[:limit]
+            return self._hits(ranked)
+
+
+def rebuild_lexical_index(collection, page_size: int = 5000):
+    """One-off backfill from the collection (e.g. a DB indexed before this index existed)."""
+    index = get_lexical_index()
+    index.clear()
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        index.add_documents(page["ids"], page["documents"] or [], page["metadatas"] or [])
+        if len(page["ids"]) < page_size:
+            break
+        offset += page_size
+    print(f"[INDEX] Rebuilt lexical index: {index.doc_count} videos")
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> LexicalIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LexicalIndex()
+        return _index
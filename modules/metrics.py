@@ -0,0 +1,193 @@
+# modules/metrics.py
+"""
+In-process metrics: counters and histograms with labels, timing spans, and a
+Prometheus text-format endpoint.
+
+    with span("chroma_query"):
+        collection.query(...)
+
+records the block's latency in the `ytsurfer_stage_seconds{stage="chroma_query"}`
+histogram and counts exceptions in `ytsurfer_stage_errors_total`. Everything
+is a no-op when METRICS_ENABLED=0.
+
+State that other modules already keep (cache hit counts, pool sizes) is
+exported with register_collector: the callback is read on every scrape.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+PREFIX = "ytsurfer_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+TOKEN_BUCKETS = (10, 100, 500, 1000, 2500, 5000, 10000, 50000, 100000, 250000)
+
+_lock = threading.Lock()
+_families = {}  # name -> {"type", "help", "buckets", "values": {labels: value}}
+_collectors = []  # callables returning [(name, type, help, labels, value)], read at scrape time
+
+
+def _family(name: str, kind: str, help_text: str, buckets=None) -> dict:
+    family = _families.get(name)
+    if family is None:
+        family = _families[name] = {"type": kind, "help": help_text, "buckets": buckets, "values": {}}
+    return family
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, help_text: str = "", **labels):
+    """Add to a counter (name without prefix, conventionally ending in _total)."""
+    if not METRICS_ENABLED:
+        return
+    key = _label_key(labels)
+    with _lock:
+        values = _family(name, "counter", help_text)["values"]
+        values[key] = values.get(key, 0) + value
+
+
+def observe(name: str, value: float, buckets=LATENCY_BUCKETS, help_text: str = "", **labels):
+    """Record one observation in a histogram."""
+    if not METRICS_ENABLED:
+        return
+    key = _label_key(labels)
+    with _lock:
+        family = _family(name, "histogram", help_text, buckets)
+        entry = family["values"].get(key)
+        if entry is None:
+            entry = family["values"][key] = {"counts": [0] * len(family["buckets"]), "sum": 0.0, "count": 0}
+        index = bisect.bisect_left(family["buckets"], value)
+        if index < len(entry["counts"]):
+            entry["counts"][index] += 1
+        entry["sum"] += value
+        entry["count"] += 1
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """Time a block as one pipeline stage; exceptions are counted and re-raised."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("stage_errors_total", help_text="Failed pipeline stage executions", stage=stage, **labels)
+        raise
+    finally:
+        observe(
+            "stage_seconds",
+            time.perf_counter() - started,
+            help_text="Latency of pipeline stages",
+            stage=stage,
+            **labels,
+        )
+
+
+def register_collector(collect):
+    """
+    Export values computed at scrape time. collect() returns samples as
+    (name without prefix, "counter" or "gauge", help text, labels dict, value).
+    """
+    with _lock:
+        if collect not in _collectors:
+            _collectors.append(collect)
+
+
+def _collected() -> dict:
+    """Samples from the registered collectors, grouped like _families."""
+    families = {}
+    with _lock:
+        collectors = list(_collectors)
+    for collect in collectors:
+        try:
+            samples = collect()
+        except Exception as e:  # a broken collector must not break the scrape
+            print(f"[METRICS] ⚠️ Collector {getattr(collect, '__name__', collect)} failed: {e}")
+            continue
+        for name, kind, help_text, labels, value in samples:
+            family = families.setdefault(name, {"type": kind, "help": help_text, "values": {}})
+            family["values"][_label_key(labels)] = value
+    return families
+
+
+def reset():
+    with _lock:
+        _families.clear()
+
+
+# -------------------------------
+# Prometheus exposition
+# -------------------------------
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus() -> str:
+    lines = []
+    collected = _collected()
+    with _lock:
+        for name, family in sorted({**_families, **collected}.items()):
+            full = PREFIX + name
+            if family["help"]:
+                lines.append(f"# HELP {full} {family['help']}")
+            lines.append(f"# TYPE {full} {family['type']}")
+            for key, value in sorted(family["values"].items()):
+                if family["type"] in ("counter", "gauge"):
+                    lines.append(f"{full}{_format_labels(key)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(family["buckets"], value["counts"]):
+                    cumulative += count
+                    lines.append(f"{full}_bucket{_format_labels(key, (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{full}_bucket{_format_labels(key, (('le', '+Inf'),))} {value['count']}")
+                lines.append(f"{full}_sum{_format_labels(key)} {value['sum']}")
+                lines.append(f"{full}_count{_format_labels(key)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0"):
+    """
+    Serve /metrics from a daemon thread; returns the server, or None when
+    disabled or the port cannot be bound (e.g. taken by another worker) -
+    the app runs on without the endpoint then.
+    """
+    if not METRICS_ENABLED:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"[METRICS] ⚠️ Cannot serve metrics on :{port} ({e}); continuing without /metrics")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[METRICS] Serving Prometheus metrics on :{server.server_address[1]}/metrics")
+    return server
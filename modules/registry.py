@@ -0,0 +1,234 @@
+# modules/registry.py
+"""
+Channel registry: one row per indexed channel (id, title, URL, video count,
+last sync time), kept next to the watermarks in the sync state DB.
+
+The indexer and channel deletes keep it up to date, so listing channels no
+longer needs a scan over every video in the collection.
+
+Each stored video also gets a per-channel sequence number (`seq` metadata,
+1, 2, 3, ... in insertion order). The registry hands out these numbers, and
+channel listings page by seq range instead of by offset.
+"""
+import time
+from typing import Dict, List
+
+from modules.sync_state import transaction
+
+_COLUMNS = "c.channel_id, c.channel_title, c.channel_url, c.video_count, c.last_synced_at, w.newest_published_at"
+
+
+def _row_to_dict(row) -> Dict:
+    return {
+        "channel_id": row[0],
+        "channel_title": row[1] or "Unknown Channel",
+        "channel_url": row[2],
+        "video_count": row[3],
+        "last_synced_at": row[4],
+        "watermark": row[5],
+    }
+
+
+def record_indexed(metadatas: List[Dict]):
+    """Count freshly stored videos against their channels (one transaction)."""
+    per_channel = {}
+    for meta in metadatas:
+        cid = meta.get("channel_id")
+        if not cid:
+            continue
+        entry = per_channel.setdefault(
+            cid, {"title": meta.get("channel_title"), "url": meta.get("channel_url"), "added": 0}
+        )
+        entry["added"] += 1
+
+    now = time.time()
+    with transaction() as conn:
+        for cid, entry in per_channel.items():
+            conn.execute(
+                """
+                INSERT INTO channels (channel_id, channel_title, channel_url, video_count, last_synced_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(channel_id) DO UPDATE SET
+                    channel_title = COALESCE(excluded.channel_title, channels.channel_title),
+                    channel_url = COALESCE(excluded.channel_url, channels.channel_url),
+                    video_count = channels.video_count + excluded.video_count,
+                    last_synced_at = excluded.last_synced_at
+                """,
+                (cid, entry["title"], entry["url"], entry["added"], now),
+            )
+
+
+def allocate_seq(channel_id: str, n: int) -> int:
+    """Reserve n consecutive seq numbers for a channel; returns the first one."""
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO channels (channel_id, video_count) VALUES (?, 0)",
+            (channel_id,),
+        )
+        first = conn.execute(
+            "SELECT next_seq FROM channels WHERE channel_id = ?", (channel_id,)
+        ).fetchone()[0] + 1
+        conn.execute(
+            "UPDATE channels SET next_seq = next_seq + ? WHERE channel_id = ?",
+            (n, channel_id),
+        )
+    return first
+
+
+def count_channel_videos(channel_id: str) -> int:
+    """Number of indexed videos for a channel, from the maintained counter."""
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT video_count FROM channels WHERE channel_id = ?", (channel_id,)
+        ).fetchone()
+    return row[0] if row else 0
+
+
+def get_channel_seq_bounds(channel_id: str) -> tuple[int, int]:
+    """(video_count, highest seq handed out) for a channel."""
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT video_count, next_seq FROM channels WHERE channel_id = ?", (channel_id,)
+        ).fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+def content_stamp(channel_id: str = None) -> list:
+    """
+    A value that changes whenever videos are added to or removed from a
+    channel (or any channel, for channel_id=None). Persistent, unlike the
+    in-process data versions in modules/cache.py.
+    """
+    with transaction() as conn:
+        if channel_id is None:
+            row = conn.execute("SELECT COUNT(*), SUM(video_count), SUM(next_seq) FROM channels").fetchone()
+        else:
+            row = conn.execute(
+                "SELECT 1, video_count, next_seq FROM channels WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+    return list(row) if row else [0, 0, 0]
+
+
+def touch_channel(channel_id: str):
+    """Mark a channel as synced even when nothing new came in."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE channels SET last_synced_at = ? WHERE channel_id = ?",
+            (time.time(), channel_id),
+        )
+
+
+def remove_channel(channel_id: str):
+    with transaction() as conn:
+        conn.execute("DELETE FROM channels WHERE channel_id = ?", (channel_id,))
+
+
+def get_channel_by_url(channel_url: str):
+    with transaction() as conn:
+        row = conn.execute(
+            f"""
+            SELECT {_COLUMNS} FROM channels c
+            LEFT JOIN channel_watermarks w ON w.channel_id = c.channel_id
+            WHERE c.channel_url = ?
+            """,
+            (channel_url,),
+        ).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def get_channel(channel_id: str):
+    with transaction() as conn:
+        row = conn.execute(
+            f"""
+            SELECT {_COLUMNS} FROM channels c
+            LEFT JOIN channel_watermarks w ON w.channel_id = c.channel_id
+            WHERE c.channel_id = ?
+            """,
+            (channel_id,),
+        ).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def list_channels() -> List[Dict]:
+    with transaction() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {_COLUMNS} FROM channels c
+            LEFT JOIN channel_watermarks w ON w.channel_id = c.channel_id
+            ORDER BY c.channel_title
+            """
+        ).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def rebuild_registry(collection, page_size: int = 5000):
+    """
+    One-off backfill from the collection (e.g. a DB indexed before the
+    registry existed). Reads metadata in pages rather than all at once.
+    """
+    counts = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        metadatas = page.get("metadatas") or []
+        for meta in metadatas:
+            cid = meta.get("channel_id")
+            if not cid:
+                continue
+            entry = counts.setdefault(cid, {"title": None, "url": None, "count": 0})
+            entry["title"] = entry["title"] or meta.get("channel_title")
+            entry["url"] = entry["url"] or meta.get("channel_url")
+            entry["count"] += 1
+        if len(metadatas) < page_size:
+            break
+        offset += page_size
+
+    now = time.time()
+    with transaction() as conn:
+        conn.execute("DELETE FROM channels")
+        conn.executemany(
+            """
+            INSERT INTO channels (channel_id, channel_title, channel_url, video_count, last_synced_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [(cid, e["title"], e["url"], e["count"], now) for cid, e in counts.items()],
+        )
+    for cid in counts:
+        backfill_channel_seq(collection, cid)
+    print(f"[REGISTRY] Rebuilt registry: {len(counts)} channels")
+
+
+def backfill_channel_seq(collection, channel_id: str, page_size: int = 5000):
+    """
+    Give seq numbers to a channel's videos stored before seq existed, oldest
+    first, continuing after the highest seq already present. One-off cost.
+    """
+    highest, missing = 0, []
+    offset = 0
+    while True:
+        page = collection.get(
+            where={"channel_id": channel_id}, include=["metadatas"], limit=page_size, offset=offset
+        )
+        for vid_id, meta in zip(page["ids"], page["metadatas"] or []):
+            if isinstance(meta.get("seq"), int):
+                highest = max(highest, meta["seq"])
+            else:
+                missing.append((meta.get("published_at", ""), vid_id, meta))
+        if len(page["ids"]) < page_size:
+            break
+        offset += page_size
+
+    missing.sort(key=lambda m: m[0])
+    for start in range(0, len(missing), page_size):
+        chunk = missing[start:start + page_size]
+        for i, (_, _, meta) in enumerate(chunk):
+            meta["seq"] = highest + start + i + 1
+        collection.update(ids=[m[1] for m in chunk], metadatas=[m[2] for m in chunk])
+
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE channels SET next_seq = ? WHERE channel_id = ?",
+            (highest + len(missing), channel_id),
+        )
+    if missing:
+        print(f"[REGISTRY] Assigned seq to {len(missing)} videos of {channel_id}")
@@ -1,32 +1,177 @@
 # modules/retriever.py
+import asyncio
+import os
+import threading
+import unicodedata
 from typing import List, Dict
-from openai import OpenAI
 
-from modules.embeddings import get_embedding
+import numpy as np
 
+from modules.cache import TTLCache, data_version
+from modules.channel_vectors import (
+    CHANNEL_VECTORS_ENABLED,
+    CHANNEL_VECTORS_RESCORE,
+    EXACT_SEARCH_MAX_VIDEOS,
+    RESCORE_FACTOR,
+    distances,
+    get_channel_vectors,
+)
+from modules.embedding_cache import get_embedding_cache
+from modules.embeddings import aget_embedding, embedding_profile, get_embedding
+from modules.lexical_index import LEXICAL_INDEX_ENABLED, get_lexical_index, rebuild_lexical_index
+from modules.metrics import inc, register_collector, span
+from modules.registry import get_channel
+
+# Repeat queries (e.g. the canned gr.Examples) skip the embedding round trip;
+# repeat (query, channel, top_k) lookups skip Chroma until that channel changes.
+query_embedding_cache = TTLCache(
+    maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400")),
+)
+retrieval_cache = TTLCache(
+    maxsize=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RETRIEVAL_CACHE_TTL", "3600")),
+)
+
+# Hybrid retrieval: vector and BM25 candidates are merged with reciprocal rank
+# fusion; distinctive keyword queries are answered from BM25 alone.
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "1") != "0"
+RRF_K = 60
+CANDIDATE_MULTIPLIER = 2  # candidates fetched from each ranker per result
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def get_query_embedding(query: str) -> list:
+    model_name, dimensions = embedding_profile()
+    key = (model_name, dimensions, normalize_query(query))
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = get_embedding(query)
+        query_embedding_cache.set(key, embedding)
+    return embedding
+
+
+async def aget_query_embedding(query: str) -> list:
+    model_name, dimensions = embedding_profile()
+    key = (model_name, dimensions, normalize_query(query))
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = await aget_embedding(query)
+        query_embedding_cache.set(key, embedding)
+    return embedding
+
+
+def get_cache_stats() -> Dict:
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "retrieval_results": retrieval_cache.stats(),
+        "document_embeddings": get_embedding_cache().stats(),
+    }
+
+
+def _cache_samples() -> list:
+    """get_cache_stats as Prometheus samples (read on every /metrics scrape)."""
+    samples = []
+    for cache, stats in get_cache_stats().items():
+        labels = {"cache": cache}
+        samples.append(("cache_hits_total", "counter", "Cache hits", labels, stats["hits"]))
+        samples.append(("cache_misses_total", "counter", "Cache misses", labels, stats["misses"]))
+        if "size" in stats:
+            samples.append(("cache_entries", "gauge", "Entries held by in-memory caches", labels, stats["size"]))
+        if "size_bytes" in stats:
+            samples.append(("cache_bytes", "gauge", "Bytes held by on-disk caches", labels, stats["size_bytes"]))
+        if "evictions" in stats:
+            samples.append(("cache_evictions_total", "counter", "Cache evictions", labels, stats["evictions"]))
+    return samples
 
-def retrieve_videos(
-    query: str, collection, top_k: int = 3, channel_id: str = None
-) -> List[Dict]:
-    client = OpenAI()
 
-    # Create embedding for query
-    embedding = get_embedding(query) 
+register_collector(_cache_samples)
+
+
+def _retrieval_key(query: str, top_k: int, channel_id: str) -> tuple:
+    # the data version changes whenever this channel (or, for "all channels",
+    # any channel) gains or loses videos, which retires older cache entries
+    return (normalize_query(query), channel_id, top_k, data_version(channel_id))
+
+
+def _as_result(meta: Dict, document: str, distance) -> Dict:
+    return {
+        "video_id": meta.get("video_id", ""),
+        "video_title": meta.get("video_title", meta.get("title", document)),
+        "channel": meta.get("channel", meta.get("channel_title", "")),
+        "channel_id": meta.get("channel_id", ""),
+        "description": document or "",
+        "score": distance,
+    }
+
+
+_vectors_checked = set()  # (channel_id, data version) whose matrix was checked against the registry
+_vectors_lock = threading.Lock()
+
+
+def _exact_search_size(collection, channel_id: str) -> int:
+    """
+    Videos in the channel's vector matrix when it should be searched exactly,
+    else 0 (no matrix, or a channel big enough for HNSW). A matrix behind the
+    registry count (e.g. indexed before matrices existed) is rebuilt once.
+    """
+    store = get_channel_vectors()
+    info = get_channel(channel_id)
+    expected = info["video_count"] if info else 0
+    size = store.count(channel_id)
+    if size < expected:
+        key = (channel_id, data_version(channel_id))
+        with _vectors_lock:
+            if key not in _vectors_checked:
+                _vectors_checked.add(key)
+                store.rebuild_channel(collection, channel_id)
+        size = store.count(channel_id)
+    if size < expected or size > EXACT_SEARCH_MAX_VIDEOS:
+        return 0
+    return size
+
+
+def _exact_channel_search(collection, embedding: list, top_k: int, channel_id: str) -> List[Dict]:
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    store = get_channel_vectors()
+    # a reduced-precision matrix only shortlists; Chroma's float32 vectors decide
+    rescore = CHANNEL_VECTORS_RESCORE and store.dtype != np.float32
+    with span("vector_search", engine="exact"):
+        hits = store.search(channel_id, embedding, top_k * RESCORE_FACTOR if rescore else top_k, space)
+        if not hits:
+            return []
+        include = ["metadatas", "documents"] + (["embeddings"] if rescore else [])
+        page = collection.get(ids=[vid_id for vid_id, _ in hits], include=include)
+    if rescore:
+        exact = distances(np.asarray(page["embeddings"], dtype=np.float32), np.asarray(embedding, dtype=np.float32), space)
+        hits = sorted(zip(page["ids"], exact.tolist()), key=lambda hit: hit[1])[:top_k]
+    stored = {vid_id: (meta, doc) for vid_id, meta, doc in zip(page["ids"], page["metadatas"], page["documents"])}
+    return [_as_result(*stored[vid_id], distance) for vid_id, distance in hits if vid_id in stored]
+
+
+def _query_collection(collection, embedding: list, top_k: int, channel_id: str = None) -> List[Dict]:
+    # single-channel queries: exact brute force over the channel's matrix when it is small enough
+    if channel_id and CHANNEL_VECTORS_ENABLED and _exact_search_size(collection, channel_id):
+        return _exact_channel_search(collection, embedding, top_k, channel_id)
 
     # Query Chroma
-    if not channel_id:
-        results = collection.query(
-            query_embeddings=[embedding],
-            n_results=top_k,
-            include=["metadatas", "documents", "distances"],
-        )
-    else:
-        results = collection.query(
-            query_embeddings=[embedding],
-            n_results=top_k,
-            include=["metadatas", "documents", "distances"],
-            where={"channel_id": channel_id},
-        )
+    with span("chroma_query", scope="channel" if channel_id else "all"):
+        if not channel_id:
+            results = collection.query(
+                query_embeddings=[embedding],
+                n_results=top_k,
+                include=["metadatas", "documents", "distances"],
+            )
+        else:
+            results = collection.query(
+                query_embeddings=[embedding],
+                n_results=top_k,
+                include=["metadatas", "documents", "distances"],
+                where={"channel_id": channel_id},
+            )
     # Build list of standardized dicts
     videos = []
     metadatas_list = results.get("metadatas", [[]])[0]  # list of metadata dicts
@@ -35,15 +180,113 @@ def retrieve_videos(
 
     for idx, meta in enumerate(metadatas_list):
         videos.append(
-            {
-                "video_id": meta.get("video_id", ""),
-                "video_title": meta.get(
-                    "video_title", meta.get("title", documents_list[idx])
-                ),
-                "channel": meta.get("channel", meta.get("channel_title", "")),
-                "description": documents_list[idx] if idx < len(documents_list) else "",
-                "score": distances_list[idx] if idx < len(distances_list) else None,
-            }
+            _as_result(
+                meta,
+                documents_list[idx] if idx < len(documents_list) else "",
+                distances_list[idx] if idx < len(distances_list) else None,
+            )
+        )
+    return videos
+
+
+_lexical_checked = False
+_lexical_check_lock = threading.Lock()
+
+
+def _ensure_lexical_index(collection):
+    """Backfill the lexical index once per process if it is empty but the collection is not."""
+    global _lexical_checked
+    with _lexical_check_lock:
+        if not _lexical_checked:
+            if get_lexical_index().doc_count == 0 and collection.count() > 0:
+                rebuild_lexical_index(collection)
+            _lexical_checked = True
+
+
+def _lexical_fast_path(collection, query: str, top_k: int, channel_id: str = None):
+    if not (LEXICAL_INDEX_ENABLED and LEXICAL_FAST_PATH):
+        return None
+    _ensure_lexical_index(collection)
+    with span("lexical_search", mode="fast_path"):
+        hits = get_lexical_index().confident_hits(query, channel_id, limit=top_k)
+    return [_as_video(h) for h in hits] or None
+
+
+def _lexical_candidates(collection, query: str, top_k: int, channel_id: str = None) -> List[Dict]:
+    if not LEXICAL_INDEX_ENABLED:
+        return []
+    _ensure_lexical_index(collection)
+    with span("lexical_search", mode="candidates"):
+        hits = get_lexical_index().search(query, channel_id, limit=top_k * CANDIDATE_MULTIPLIER)
+    return [_as_video(h) for h in hits]
+
+
+def _as_video(hit: Dict) -> Dict:
+    return {k: hit[k] for k in ("video_id", "video_title", "channel", "channel_id", "description")} | {"score": None}
+
+
+def fuse_results(rankings: List[List[Dict]], top_k: int) -> List[Dict]:
+    """Reciprocal rank fusion: sum of 1 / (RRF_K + rank) over the rankings a video appears in."""
+    fused, videos = {}, {}
+    for ranking in rankings:
+        for rank, video in enumerate(ranking, start=1):
+            vid_id = video["video_id"]
+            fused[vid_id] = fused.get(vid_id, 0.0) + 1.0 / (RRF_K + rank)
+            # keep the first (vector) copy, which carries the distance
+            videos.setdefault(vid_id, video)
+    ranked = sorted(fused, key=lambda vid_id: -fused[vid_id])[:top_k]
+    return [videos[vid_id] for vid_id in ranked]
+
+
+def _vector_k(top_k: int) -> int:
+    return top_k * CANDIDATE_MULTIPLIER if LEXICAL_INDEX_ENABLED else top_k
+
+
+def retrieve_videos(
+    query: str, collection, top_k: int = 3, channel_id: str = None
+) -> List[Dict]:
+    cache_key = _retrieval_key(query, top_k, channel_id)
+    cached = retrieval_cache.get(cache_key)
+    if cached is not None:
+        inc("retrievals_total", help_text="Retrievals by path", path="cache")
+        return [dict(v) for v in cached]
+
+    videos = _lexical_fast_path(collection, query, top_k, channel_id)
+    inc("retrievals_total", help_text="Retrievals by path", path="hybrid" if videos is None else "lexical")
+    if videos is None:
+        # Create embedding for query
+        embedding = get_query_embedding(query)
+        vector = _query_collection(collection, embedding, _vector_k(top_k), channel_id)
+        lexical = _lexical_candidates(collection, query, top_k, channel_id)
+        videos = fuse_results([vector, lexical], top_k)
+
+    retrieval_cache.set(cache_key, [dict(v) for v in videos])
+    return videos
+
+
+async def aretrieve_videos(
+    query: str, collection, top_k: int = 3, channel_id: str = None
+) -> List[Dict]:
+    """
+    Async retrieve_videos. The query embedding goes through the shared async
+    client; Chroma and the lexical index are local and blocking, so they run
+    in worker threads.
+    """
+    cache_key = _retrieval_key(query, top_k, channel_id)
+    cached = retrieval_cache.get(cache_key)
+    if cached is not None:
+        inc("retrievals_total", help_text="Retrievals by path", path="cache")
+        return [dict(v) for v in cached]
+
+    videos = await asyncio.to_thread(_lexical_fast_path, collection, query, top_k, channel_id)
+    inc("retrievals_total", help_text="Retrievals by path", path="hybrid" if videos is None else "lexical")
+    if videos is None:
+        embedding = await aget_query_embedding(query)
+        vector, lexical = await asyncio.gather(
+            asyncio.to_thread(_query_collection, collection, embedding, _vector_k(top_k), channel_id),
+            asyncio.to_thread(_lexical_candidates, collection, query, top_k, channel_id),
         )
+        videos = fuse_results([vector, lexical], top_k)
 
+    retrieval_cache.set(cache_key, [dict(v) for v in videos])
     return videos
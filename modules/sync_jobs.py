@@ -0,0 +1,167 @@
+# modules/sync_jobs.py
+"""
+Persisted sync jobs.
+
+Every call to sync_channels_from_youtube runs as a job with an id, stored in
+the sync state DB together with one checkpoint per channel:
+
+    status        pending | running | done | deferred | failed | cancelled
+    page_token    playlistItems page to continue from (None = the start)
+    pages_done    pages stored so far, contiguous from the start
+    videos_done   videos stored so far
+    head          newest videos seen, kept so the channel watermark can be
+                  moved once a resumed channel completes
+
+Checkpoints only advance over pages that were stored, so a job that was
+cancelled, failed or died with the process resumes exactly where its stored
+data ends. Cancellation is per job (an in-process event per running job).
+"""
+import json
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+from modules.sync_state import transaction
+
+_CHECKPOINT_COLUMNS = "channel_url, status, page_token, pages_done, videos_done, head, message"
+
+_cancel_events = {}  # job_id -> threading.Event, for jobs running in this process
+_events_lock = threading.Lock()
+
+
+def _job_to_dict(row) -> Dict:
+    return {
+        "job_id": row[0],
+        "channel_urls": json.loads(row[1]),
+        "delta": bool(row[2]),
+        "status": row[3],
+        "created_at": row[4],
+        "updated_at": row[5],
+    }
+
+
+def _checkpoint_to_dict(row) -> Dict:
+    return {
+        "channel_url": row[0],
+        "status": row[1],
+        "page_token": row[2],
+        "pages_done": row[3],
+        "videos_done": row[4],
+        "head": json.loads(row[5] or "[]"),
+        "message": row[6],
+    }
+
+
+# -------------------------------
+# Jobs
+# -------------------------------
+def create_job(channel_urls: List[str], delta: bool) -> str:
+    job_id = uuid.uuid4().hex[:12]
+    now = time.time()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO sync_jobs VALUES (?, ?, ?, 'pending', ?, ?)",
+            (job_id, json.dumps(channel_urls), int(delta), now, now),
+        )
+        conn.executemany(
+            "INSERT INTO sync_checkpoints (job_id, channel_url) VALUES (?, ?)",
+            [(job_id, url) for url in channel_urls],
+        )
+    return job_id
+
+
+def get_job(job_id: str):
+    """The job with its per-channel checkpoints, or None."""
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT job_id, channel_urls, delta, status, created_at, updated_at FROM sync_jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if not row:
+            return None
+        checkpoints = conn.execute(
+            f"SELECT {_CHECKPOINT_COLUMNS} FROM sync_checkpoints WHERE job_id = ?", (job_id,)
+        ).fetchall()
+    job = _job_to_dict(row)
+    job["channels"] = {c["channel_url"]: c for c in map(_checkpoint_to_dict, checkpoints)}
+    return job
+
+
+def list_jobs(statuses=None, limit: int = 50) -> List[Dict]:
+    """Newest first, optionally only the given statuses."""
+    query = "SELECT job_id, channel_urls, delta, status, created_at, updated_at FROM sync_jobs"
+    params = []
+    if statuses:
+        query += f" WHERE status IN ({','.join('?' * len(statuses))})"
+        params.extend(statuses)
+    query += " ORDER BY created_at DESC LIMIT ?"
+    with transaction() as conn:
+        rows = conn.execute(query, (*params, limit)).fetchall()
+    return [_job_to_dict(r) for r in rows]
+
+
+def set_job_status(job_id: str, status: str):
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE sync_jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+            (status, time.time(), job_id),
+        )
+
+
+def interrupted_jobs() -> List[Dict]:
+    """Jobs marked running that no thread of this process is running (e.g. after a crash)."""
+    with _events_lock:
+        active = set(_cancel_events)
+    return [j for j in list_jobs(["running"]) if j["job_id"] not in active]
+
+
+# -------------------------------
+# Channel checkpoints
+# -------------------------------
+def get_checkpoint(job_id: str, channel_url: str):
+    with transaction() as conn:
+        row = conn.execute(
+            f"SELECT {_CHECKPOINT_COLUMNS} FROM sync_checkpoints WHERE job_id = ? AND channel_url = ?",
+            (job_id, channel_url),
+        ).fetchone()
+    return _checkpoint_to_dict(row) if row else None
+
+
+def save_checkpoint(job_id: str, channel_url: str, **fields):
+    """Update some of status, page_token, pages_done, videos_done, head, message."""
+    if "head" in fields:
+        fields["head"] = json.dumps(fields["head"])
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with transaction() as conn:
+        conn.execute(
+            f"UPDATE sync_checkpoints SET {assignments} WHERE job_id = ? AND channel_url = ?",
+            (*fields.values(), job_id, channel_url),
+        )
+        conn.execute("UPDATE sync_jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+
+# -------------------------------
+# Cancellation
+# -------------------------------
+def register_job(job_id: str) -> threading.Event:
+    """Mark a job as running in this process; returns its cancel event."""
+    with _events_lock:
+        event = _cancel_events[job_id] = threading.Event()
+    return event
+
+
+def unregister_job(job_id: str):
+    with _events_lock:
+        _cancel_events.pop(job_id, None)
+
+
+def cancel_job(job_id: str = None) -> int:
+    """Cancel one running job, or all of them; returns how many were signalled."""
+    with _events_lock:
+        events = [_cancel_events[job_id]] if job_id in _cancel_events else (
+            list(_cancel_events.values()) if job_id is None else []
+        )
+    for event in events:
+        event.set()
+    return len(events)
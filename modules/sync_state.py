@@ -0,0 +1,209 @@
+# modules/sync_state.py
+"""
+Small local sqlite store for sync bookkeeping that does not belong in Chroma,
+e.g. per-channel watermarks used by delta syncs, the channel registry
+(see modules/registry.py), YouTube API quota usage, sync jobs with their
+checkpoints (see modules/sync_jobs.py) and per-channel description
+boilerplate (see modules/boilerplate.py).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SYNC_STATE_PATH = os.getenv("SYNC_STATE_PATH", "./youtube_db/sync_state.sqlite3")
+
+# how many of the newest video IDs to remember per channel
+WATERMARK_ID_LIMIT = 200
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS channel_watermarks (
+        channel_id TEXT PRIMARY KEY,
+        newest_published_at TEXT NOT NULL,
+        recent_video_ids TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS channels (
+        channel_id TEXT PRIMARY KEY,
+        channel_title TEXT,
+        channel_url TEXT,
+        video_count INTEGER NOT NULL DEFAULT 0,
+        last_synced_at REAL,
+        next_seq INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS feed_validators (
+        channel_id TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS youtube_quota (
+        day TEXT NOT NULL,
+        endpoint TEXT NOT NULL,
+        units INTEGER NOT NULL,
+        PRIMARY KEY (day, endpoint)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_jobs (
+        job_id TEXT PRIMARY KEY,
+        channel_urls TEXT NOT NULL,
+        delta INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sync_checkpoints (
+        job_id TEXT NOT NULL,
+        channel_url TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        page_token TEXT,
+        pages_done INTEGER NOT NULL DEFAULT 0,
+        videos_done INTEGER NOT NULL DEFAULT 0,
+        head TEXT,
+        message TEXT,
+        PRIMARY KEY (job_id, channel_url)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS channel_boilerplate (
+        channel_id TEXT PRIMARY KEY,
+        videos INTEGER NOT NULL DEFAULT 0,
+        line_counts TEXT NOT NULL DEFAULT '{}',
+        tokens_before INTEGER NOT NULL DEFAULT 0,
+        tokens_after INTEGER NOT NULL DEFAULT 0,
+        updated_at REAL
+    )
+    """,
+]
+
+# columns added after a table first shipped; applied to older state DBs
+_MIGRATIONS = [
+    "ALTER TABLE channels ADD COLUMN next_seq INTEGER NOT NULL DEFAULT 0",
+]
+
+_conn = None
+_lock = threading.RLock()
+
+
+def _connect():
+    global _conn
+    if _conn is None:
+        if os.path.dirname(SYNC_STATE_PATH):
+            os.makedirs(os.path.dirname(SYNC_STATE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(SYNC_STATE_PATH, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            _conn.execute(statement)
+        for statement in _MIGRATIONS:
+            try:
+                _conn.execute(statement)
+            except sqlite3.OperationalError:
+                pass  # already applied
+        _conn.commit()
+    return _conn
+
+
+@contextmanager
+def transaction():
+    """Serialised access to the state DB; commits on success, rolls back on error."""
+    with _lock:
+        conn = _connect()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+# -------------------------------
+# Channel watermarks
+# -------------------------------
+def get_watermark(channel_id: str):
+    """Return {"published_at", "video_ids"} for a channel, or None if never synced."""
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT newest_published_at, recent_video_ids FROM channel_watermarks WHERE channel_id = ?",
+            (channel_id,),
+        ).fetchone()
+    if not row:
+        return None
+    return {"published_at": row[0], "video_ids": json.loads(row[1])}
+
+
+def advance_watermark(channel_id: str, videos: list):
+    """
+    Move a channel's watermark past the given (successfully indexed) videos.
+    Timestamps are ISO-8601 UTC strings from the API, so they compare as text.
+    """
+    dated = [v for v in videos if v.get("published_at")]
+    if not dated:
+        return
+
+    dated.sort(key=lambda v: v["published_at"], reverse=True)
+    current = get_watermark(channel_id) or {"published_at": "", "video_ids": []}
+    newest = max(current["published_at"], dated[0]["published_at"])
+    ids = list(dict.fromkeys([v["video_id"] for v in dated] + current["video_ids"]))
+
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO channel_watermarks VALUES (?, ?, ?, ?)",
+            (channel_id, newest, json.dumps(ids[:WATERMARK_ID_LIMIT]), time.time()),
+        )
+
+
+def clear_watermark(channel_id: str):
+    with transaction() as conn:
+        conn.execute("DELETE FROM channel_watermarks WHERE channel_id = ?", (channel_id,))
+
+
+# -------------------------------
+# RSS conditional-GET validators
+# -------------------------------
+def get_feed_validators(channel_id: str) -> dict:
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT etag, last_modified FROM feed_validators WHERE channel_id = ?",
+            (channel_id,),
+        ).fetchone()
+    return {"etag": row[0], "last_modified": row[1]} if row else {}
+
+
+def set_feed_validators(channel_id: str, etag: str = None, last_modified: str = None):
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO feed_validators VALUES (?, ?, ?)",
+            (channel_id, etag, last_modified),
+        )
+
+
+# -------------------------------
+# YouTube Data API quota usage
+# -------------------------------
+def add_quota_usage(day: str, endpoint: str, units: int):
+    with transaction() as conn:
+        conn.execute(
+            """
+            INSERT INTO youtube_quota VALUES (?, ?, ?)
+            ON CONFLICT(day, endpoint) DO UPDATE SET units = units + excluded.units
+            """,
+            (day, endpoint, units),
+        )
+
+
+def get_quota_usage(day: str) -> dict:
+    """{endpoint: units} spent on the given quota day."""
+    with transaction() as conn:
+        rows = conn.execute("SELECT endpoint, units FROM youtube_quota WHERE day = ?", (day,)).fetchall()
+    return dict(rows)
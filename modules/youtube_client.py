@@ -0,0 +1,198 @@
+# modules/youtube_client.py
+"""
+YouTube Data API access with rate limiting, retries and quota accounting.
+
+Every API call goes through YouTubeClient.execute, which
+- waits for a token from a process-wide token bucket,
+- retries 429/5xx responses and connection errors with jittered
+  exponential backoff (honouring Retry-After),
+- charges the endpoint's quota cost to the current quota day (midnight
+  Pacific time, like YouTube's own reset) in the sync state DB, and
+- refuses calls that would overrun the daily budget (QuotaExceeded).
+
+Callers can check quota_low() to choose cheaper work (delta instead of full
+syncs) before the budget runs out.
+"""
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from modules.metrics import inc, span
+from modules.sync_state import add_quota_usage, get_quota_usage
+
+YOUTUBE_API_ENDPOINT = os.getenv("YOUTUBE_API_ENDPOINT")  # e.g. tests/fake_youtube_server.py
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+# units held back for cheap delta syncs; below this, full syncs are deferred
+YOUTUBE_QUOTA_RESERVE = int(os.getenv("YOUTUBE_QUOTA_RESERVE", "1000"))
+YOUTUBE_REQUESTS_PER_SECOND = float(os.getenv("YOUTUBE_REQUESTS_PER_SECOND", "10"))
+YOUTUBE_MAX_RETRIES = int(os.getenv("YOUTUBE_MAX_RETRIES", "5"))
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 30.0
+
+# quota units per call (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COSTS = {
+    "channels.list": 1,
+    "playlistItems.list": 1,
+    "videos.list": 1,
+    "search.list": 100,
+}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+QUOTA_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+
+class QuotaExceeded(Exception):
+    """The daily YouTube API budget is (or would be) used up."""
+
+
+# -------------------------------
+# Rate limiting
+# -------------------------------
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_bucket = TokenBucket(YOUTUBE_REQUESTS_PER_SECOND, capacity=2 * YOUTUBE_REQUESTS_PER_SECOND)
+
+
+# -------------------------------
+# Quota accounting
+# -------------------------------
+_PACIFIC = None
+
+
+def quota_day(now: datetime = None) -> str:
+    """The quota day (YouTube resets quotas at midnight Pacific time)."""
+    global _PACIFIC
+    if _PACIFIC is None:
+        try:
+            from zoneinfo import ZoneInfo
+
+            _PACIFIC = ZoneInfo("America/Los_Angeles")
+        except Exception:  # no tz database: fall back to PST
+            _PACIFIC = timezone(timedelta(hours=-8))
+    return (now or datetime.now(timezone.utc)).astimezone(_PACIFIC).strftime("%Y-%m-%d")
+
+
+def quota_used() -> int:
+    return sum(get_quota_usage(quota_day()).values())
+
+
+def quota_remaining() -> int:
+    return max(0, YOUTUBE_DAILY_QUOTA - quota_used())
+
+
+def quota_low() -> bool:
+    """True once only the reserve for delta syncs is left."""
+    return quota_remaining() <= YOUTUBE_QUOTA_RESERVE
+
+
+def quota_status() -> dict:
+    day = quota_day()
+    usage = get_quota_usage(day)
+    return {
+        "day": day,
+        "used": sum(usage.values()),
+        "budget": YOUTUBE_DAILY_QUOTA,
+        "reserve": YOUTUBE_QUOTA_RESERVE,
+        "by_endpoint": usage,
+    }
+
+
+# -------------------------------
+# Client
+# -------------------------------
+def _error_reason(error) -> str:
+    try:
+        return json.loads(error.content)["error"]["errors"][0]["reason"]
+    except Exception:
+        return ""
+
+
+def _backoff(attempt: int, retry_after: str = None) -> float:
+    if retry_after and retry_after.isdigit():
+        return min(RETRY_MAX_SECONDS, float(retry_after))
+    # full jitter: anywhere between 0 and the exponential cap
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2**attempt))
+
+
+class YouTubeClient:
+    def __init__(self, api_key: str):
+        # googleapiclient is slow to import; only load it when we talk to YouTube
+        from googleapiclient.discovery import build
+
+        if YOUTUBE_API_ENDPOINT:
+            self.service = build(
+                "youtube",
+                "v3",
+                developerKey=api_key,
+                client_options={"api_endpoint": YOUTUBE_API_ENDPOINT},
+                static_discovery=True,
+            )
+        else:
+            self.service = build("youtube", "v3", developerKey=api_key)
+
+    def execute(self, endpoint: str, make_request):
+        """
+        Run make_request(service).execute() as an `endpoint` call
+        (e.g. "playlistItems.list"), with rate limiting, retries and quota
+        accounting.
+        """
+        from googleapiclient.errors import HttpError
+
+        cost = QUOTA_COSTS.get(endpoint, 1)
+        attempt = 0
+        while True:
+            if quota_used() + cost > YOUTUBE_DAILY_QUOTA:
+                raise QuotaExceeded(f"YouTube daily quota of {YOUTUBE_DAILY_QUOTA} units used up")
+            _bucket.acquire()
+            # YouTube charges for every request it receives, failed ones too
+            add_quota_usage(quota_day(), endpoint, cost)
+            inc("youtube_quota_units_total", cost, help_text="YouTube API quota units spent", endpoint=endpoint)
+            try:
+                with span("youtube_request", endpoint=endpoint):
+                    return make_request(self.service).execute()
+            except HttpError as e:
+                status, reason = e.resp.status, _error_reason(e)
+                if reason in QUOTA_REASONS:
+                    # YouTube's count wins (other apps may share the key): mark the day as spent
+                    add_quota_usage(quota_day(), endpoint, quota_remaining())
+                    raise QuotaExceeded(f"YouTube reported {reason}") from e
+                retryable = status in RETRYABLE_STATUSES or (status == 403 and reason in RATE_LIMIT_REASONS)
+                if not retryable or attempt >= YOUTUBE_MAX_RETRIES:
+                    raise
+                delay = _backoff(attempt, e.resp.get("retry-after"))
+                label = f"HTTP {status}"
+            except (ConnectionError, TimeoutError, OSError) as e:
+                if attempt >= YOUTUBE_MAX_RETRIES:
+                    raise
+                delay = _backoff(attempt)
+                label = type(e).__name__
+
+            attempt += 1
+            inc("youtube_retries_total", help_text="Retried YouTube API calls", endpoint=endpoint)
+            print(f"[YOUTUBE] {endpoint} failed ({label}), retry {attempt}/{YOUTUBE_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
@@ -13,11 +13,10 @@ def get_channel_id(youtube, channel_url: str) -> str:
     # If it's a handle (@xyz or full URL)
     if "@" in channel_url:
         handle = channel_url.split("@")[-1]
-        request = youtube.channels().list(
-            part="id",
-            forHandle=handle
+        response = youtube.execute(
+            "channels.list",
+            lambda yt: yt.channels().list(part="id", forHandle=handle),
         )
-        response = request.execute()
         return response["items"][0]["id"]
 
     if channel_url.startswith("UC"):
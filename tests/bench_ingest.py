@@ -0,0 +1,321 @@
+# tests/bench_ingest.py
+"""
+Offline ingestion benchmark.
+
+Runs the ingest paths against local fakes of the YouTube Data API
+(tests/fake_youtube_server.py), the embeddings endpoint
+(tests/fake_embedding_server.py) and the RSS feeds
+(tests/fake_feed_server.py), each with configurable latency:
+
+    sync     sync_channels_from_youtube over fresh channels
+    resync   the same channels again (delta sync, nothing new)
+    index    index_videos on already-fetched videos
+    poll     poll_once twice: a few new uploads per feed, then all 304s
+
+Every scenario runs in a fresh interpreter (so peak RSS is its own) while
+the fakes run in this process, and reports videos/sec, API calls, peak RSS,
+boilerplate tokens stripped before embedding and per-stage seconds.
+
+    python -m tests.bench_ingest [--channels 5] [--videos 1000]
+        [--youtube-latency 0.05] [--embed-latency 0.2] [--feed-latency 0.05]
+        [--scenarios sync,resync,index,poll] [--json out.json]
+        [--baseline previous.json] [--tolerance 0.2]
+
+With --baseline, exits non-zero if any scenario's videos/sec dropped by more
+than the tolerance.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.fake_embedding_server import FakeEmbeddingServer
+from tests.fake_feed_server import FakeFeedServer
+from tests.fake_youtube_server import FakeYouTubeServer
+
+SCENARIOS = ["sync", "resync", "index", "poll"]
+NEW_UPLOADS_PER_FEED = 2
+BOILERPLATE = (
+    "\n\nSubscribe: https://www.youtube.com/@bench?sub_confirmation=1"
+    "\nInstagram: https://instagram.com/bench\nFacebook: https://facebook.com/bench"
+    "\n#bhakti #carnatic #music"
+)
+
+
+# -------------------------------
+# Synthetic channels
+# -------------------------------
+def make_channels(n_channels: int, n_videos: int) -> dict:
+    """{channel_id: {"title", "handle", "videos": [newest first]}}, deterministic."""
+    channels = {}
+    for c in range(n_channels):
+        videos = []
+        for i in range(n_videos):
+            # newest first: video 0 is the most recent upload
+            day = n_videos - i
+            videos.append(
+                {
+                    "video_id": f"b{c}v{i}",
+                    "title": f"Bench channel {c} episode {n_videos - i}",
+                    "description": f"Episode {n_videos - i} of channel {c}. " * 8 + BOILERPLATE,
+                    "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1_600_000_000 + day * 3600)),
+                }
+            )
+        channels[f"UCbench{c:04d}"] = {"title": f"Bench channel {c}", "handle": f"bench{c}", "videos": videos}
+    return channels
+
+
+def make_feeds(channels: dict) -> dict:
+    """RSS view of the channels, with a few uploads the Data API has not seen."""
+    feeds = {}
+    for cid, channel in channels.items():
+        newest = channel["videos"][0]["published_at"] if channel["videos"] else "2020-01-01T00:00:00Z"
+        fresh = [
+            {
+                "video_id": f"{cid}new{i}",
+                "title": f"New upload {i}",
+                "description": "Fresh from the feed",
+                "published_at": newest.replace("Z", f".{i + 1}Z"),
+            }
+            for i in range(NEW_UPLOADS_PER_FEED)
+        ]
+        feeds[cid] = {"title": channel["title"], "videos": fresh + channel["videos"][:15 - NEW_UPLOADS_PER_FEED]}
+    return feeds
+
+
+# -------------------------------
+# Scenarios (run in the child interpreter)
+# -------------------------------
+def _peak_rss_mb() -> float:
+    import resource
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_sync(args) -> dict:
+    from youtube_sync import sync_channels_from_youtube
+
+    urls = [f"https://www.youtube.com/@bench{c}" for c in range(args.channels)]
+    stats = {}
+    started = time.perf_counter()
+    indexed = sum(count for _, count in sync_channels_from_youtube("bench-key", urls, stats=stats))
+    seconds = time.perf_counter() - started
+    stages = {
+        stage: round(sum(s.get(f"{stage}_seconds", 0.0) for s in stats.values()), 2)
+        for stage in ("fetch", "embed", "store")
+    }
+    return {"videos": indexed, "seconds": seconds, "stages": stages}
+
+
+def run_index(args) -> dict:
+    import modules.indexer as indexer
+    from modules.db import get_collection
+
+    # time each stage as index_videos calls it
+    stages = {}
+
+    def timed(name, fn):
+        def wrapper(*a, **kw):
+            t = time.perf_counter()
+            try:
+                return fn(*a, **kw)
+            finally:
+                stages[name] = stages.get(name, 0.0) + time.perf_counter() - t
+
+        return wrapper
+
+    for name in ("build_records", "drop_existing", "strip_records", "embed_records", "store_records"):
+        setattr(indexer, name, timed(name, getattr(indexer, name)))
+
+    channels = make_channels(args.channels, args.videos)
+    collection = get_collection()
+    started = time.perf_counter()
+    for c, (cid, channel) in enumerate(channels.items()):
+        videos = [v | {"channel_id": cid, "channel_title": channel["title"]} for v in channel["videos"]]
+        indexer.index_videos(videos, collection, f"https://www.youtube.com/@bench{c}")
+    seconds = time.perf_counter() - started
+    return {
+        "videos": collection.count(),
+        "seconds": seconds,
+        "stages": {k: round(v, 2) for k, v in stages.items()},
+    }
+
+
+def run_poll(args) -> dict:
+    import asyncio
+
+    from youtube_poller import poll_once
+
+    channel_ids = list(make_channels(args.channels, 0))
+    started = time.perf_counter()
+    first = asyncio.run(poll_once(channel_ids))
+    first_seconds = time.perf_counter() - started
+    asyncio.run(poll_once(channel_ids))
+    seconds = time.perf_counter() - started
+    return {
+        "videos": sum(first.values()),
+        "seconds": seconds,
+        "stages": {"first_poll": round(first_seconds, 2), "second_poll": round(seconds - first_seconds, 2)},
+    }
+
+
+RUNNERS = {"sync": run_sync, "resync": run_sync, "index": run_index, "poll": run_poll}
+
+
+def _boilerplate_tokens_saved() -> int:
+    from modules.boilerplate import boilerplate_stats
+
+    return sum(c["tokens_saved"] for c in boilerplate_stats().values())
+
+
+def child(args):
+    saved_before = _boilerplate_tokens_saved()
+    result = RUNNERS[args.run](args)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    result["boilerplate_tokens_saved"] = _boilerplate_tokens_saved() - saved_before
+    print(json.dumps(result))
+
+
+# -------------------------------
+# Driver
+# -------------------------------
+def run_scenario(name: str, args, env: dict, servers: dict) -> dict:
+    before = {
+        "youtube_calls": servers["youtube"].requests,
+        "embedding_requests": servers["embedding"].requests,
+        "embedded_inputs": servers["embedding"].inputs,
+        "feed_requests": servers["feed"].requests,
+        "feed_not_modified": servers["feed"].not_modified,
+    }
+    proc = subprocess.run(
+        [sys.executable, "-m", "tests.bench_ingest", "--run", name,
+         "--channels", str(args.channels), "--videos", str(args.videos)],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+        return {"scenario": name, "error": tail}
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    after = {
+        "youtube_calls": servers["youtube"].requests,
+        "embedding_requests": servers["embedding"].requests,
+        "embedded_inputs": servers["embedding"].inputs,
+        "feed_requests": servers["feed"].requests,
+        "feed_not_modified": servers["feed"].not_modified,
+    }
+    result.update({k: after[k] - before[k] for k in after})
+    result["scenario"] = name
+    result["videos_per_sec"] = round(result["videos"] / result["seconds"], 1) if result["seconds"] else 0.0
+    result["seconds"] = round(result["seconds"], 2)
+    return result
+
+
+def print_report(results: list):
+    print(
+        f"{'scenario':<10}{'videos':>8}{'seconds':>9}{'videos/s':>10}{'yt calls':>10}"
+        f"{'embed req':>11}{'feeds (304)':>13}{'peak RSS MB':>13}{'stripped tok':>14}  stages (s)"
+    )
+    for r in results:
+        if "error" in r:
+            print(f"{r['scenario']:<10}  ⚠️ {r['error']}")
+            continue
+        stages = ", ".join(f"{k} {v}" for k, v in r["stages"].items())
+        feeds = f"{r['feed_requests']} ({r['feed_not_modified']})"
+        print(
+            f"{r['scenario']:<10}{r['videos']:>8}{r['seconds']:>9}{r['videos_per_sec']:>10}"
+            f"{r['youtube_calls']:>10}{r['embedding_requests']:>11}{feeds:>13}{r['peak_rss_mb']:>13}"
+            f"{r.get('boilerplate_tokens_saved', 0):>14}  {stages}"
+        )
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> list:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"] if "error" not in r}
+    failures = []
+    for r in results:
+        base = baseline.get(r["scenario"])
+        if "error" in r:
+            failures.append(f"{r['scenario']}: {r['error']}")
+        elif base and base["videos_per_sec"] and r["videos_per_sec"] < base["videos_per_sec"] * (1 - tolerance):
+            failures.append(
+                f"{r['scenario']}: {r['videos_per_sec']} videos/s vs baseline {base['videos_per_sec']}"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--videos", type=int, default=1000, help="videos per channel")
+    parser.add_argument("--youtube-latency", type=float, default=0.05)
+    parser.add_argument("--embed-latency", type=float, default=0.2)
+    parser.add_argument("--feed-latency", type=float, default=0.05)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--json", help="write results here")
+    parser.add_argument("--baseline", help="results JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--run", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        child(args)
+        return
+
+    channels = make_channels(args.channels, args.videos)
+    servers = {
+        "youtube": FakeYouTubeServer(channels, latency=args.youtube_latency).start(),
+        "embedding": FakeEmbeddingServer(latency=args.embed_latency).start(),
+        "feed": FakeFeedServer(make_feeds(channels), latency=args.feed_latency).start(),
+    }
+    tmp = tempfile.mkdtemp(prefix="bench_ingest_")
+    base_env = os.environ | {
+        "YOUTUBE_API_ENDPOINT": servers["youtube"].endpoint,
+        "YOUTUBE_FEED_URL_TEMPLATE": servers["feed"].url_template,
+        "OPENAI_BASE_URL": servers["embedding"].base_url,
+        "OPENAI_API_KEY": "sk-fake",
+        "EMBEDDING_BACKEND": "openai",
+    }
+
+    def state_env(name: str) -> dict:
+        # sync, resync and poll share one store; index gets its own
+        root = os.path.join(tmp, "index" if name == "index" else "synced")
+        return base_env | {
+            "CHROMA_PATH": os.path.join(root, "db"),
+            "SYNC_STATE_PATH": os.path.join(root, "sync_state.sqlite3"),
+            "LEXICAL_INDEX_PATH": os.path.join(root, "lexical_index.sqlite3"),
+            "CHANNEL_VECTORS_PATH": os.path.join(root, "channel_vectors"),
+            "ANSWER_CACHE_PATH": os.path.join(root, "answer_cache.sqlite3"),
+            # a warm embedding cache would hide the embedding cost
+            "EMBEDDING_CACHE_PATH": os.path.join(tmp, f"{name}_embedding_cache.sqlite3"),
+        }
+
+    results = []
+    print(f"[BENCH] {args.channels} channels × {args.videos} videos, state in {tmp}")
+    for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+        results.append(run_scenario(name, args, state_env(name), servers))
+    for server in servers.values():
+        server.stop()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+    if args.baseline:
+        failures = compare(results, args.baseline, args.tolerance)
+        if failures:
+            print("\n❌ " + "\n❌ ".join(failures))
+            sys.exit(1)
+        print("\n✅ No throughput regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# tests/bench_recall.py
+"""
+Recall benchmark for reduced-dimension and quantised vector storage.
+
+Every configuration (output dimensions × matrix dtype × rescoring) is built
+as a channel matrix (modules/channel_vectors.py) and queried; recall@k is
+measured against exact float32 search over the full-size vectors:
+
+    dims      first N dimensions, re-normalised (what the embeddings API
+              returns for dimensions=N with text-embedding-3 models)
+    dtype     float32, float16 or int8 (per-row scalar quantisation)
+    rescore   top RESCORE_FACTOR * k candidates re-ranked with float32
+              vectors of the same dimensions (what Chroma holds)
+
+Vectors come from the local collection (--channel, or every stored video)
+or, without an index, from a synthetic corpus with a decaying spectrum.
+Queries are stored vectors with noise added, standing in for paraphrases.
+
+    python -m tests.bench_recall [--channel UC...] [--synthetic 20000]
+        [--queries 200] [--k 10] [--dims 3072,1536,1024,512,256]
+        [--dtypes float32,float16,int8] [--json out.json]
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from modules.channel_vectors import RESCORE_FACTOR, ChannelVectors, distances
+
+QUERY_NOISE = 0.3
+
+
+# -------------------------------
+# Vectors
+# -------------------------------
+def load_collection_vectors(channel_id: str = None, page_size: int = 5000) -> np.ndarray:
+    from modules.db import get_collection
+
+    collection = get_collection()
+    where = {"channel_id": channel_id} if channel_id else None
+    rows, offset = [], 0
+    while True:
+        page = collection.get(where=where, include=["embeddings"], limit=page_size, offset=offset)
+        if len(page["ids"]):
+            rows.append(np.asarray(page["embeddings"], dtype=np.float32))
+        if len(page["ids"]) < page_size:
+            break
+        offset += page_size
+    return np.concatenate(rows) if rows else np.empty((0, 0), dtype=np.float32)
+
+
+def synthetic_vectors(n: int, dims: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors whose variance decays along the dimensions, like Matryoshka embeddings."""
+    rng = np.random.default_rng(seed)
+    spectrum = 1.0 / np.sqrt(1.0 + np.arange(dims) / 32.0)
+    centers = rng.standard_normal((max(1, n // 50), dims))
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.8 * rng.standard_normal((n, dims))
+    return normalize(vectors * spectrum)
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def make_queries(corpus: np.ndarray, n: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = corpus[rng.choice(len(corpus), size=min(n, len(corpus)), replace=False)]
+    noise = rng.standard_normal(picks.shape) * QUERY_NOISE / np.sqrt(corpus.shape[1])
+    return normalize(picks + noise)
+
+
+def exact_top_k(corpus: np.ndarray, query: np.ndarray, k: int) -> list:
+    scores = distances(corpus, query)
+    nearest = np.argpartition(scores, k - 1)[:k]
+    return nearest[np.argsort(scores[nearest])].tolist()
+
+
+# -------------------------------
+# Configurations
+# -------------------------------
+def run_config(corpus, queries, truth, dims: int, dtype: str, rescore: bool, k: int) -> dict:
+    reduced = normalize(corpus[:, :dims])
+    ids = [str(i) for i in range(len(corpus))]
+    with tempfile.TemporaryDirectory() as root:
+        store = ChannelVectors(root, dtype)
+        store.add("bench", ids, reduced)
+        store.search("bench", normalize(queries[:1, :dims])[0], k)  # map the files before timing
+
+        hits, latencies = 0, []
+        for query, expected in zip(queries, truth):
+            q = normalize(query[None, :dims])[0]
+            started = time.perf_counter()
+            found = [int(i) for i, _ in store.search("bench", q, k * RESCORE_FACTOR if rescore else k)]
+            if rescore:
+                scores = distances(reduced[found], q)
+                found = [found[i] for i in np.argsort(scores)[:k]]
+            latencies.append(time.perf_counter() - started)
+            hits += len(set(found[:k]) & set(expected))
+
+    bytes_per_vector = dims * np.dtype(dtype).itemsize + (4 if dtype == "int8" else 0)
+    return {
+        "dims": dims,
+        "dtype": dtype,
+        "rescore": rescore,
+        "recall": round(hits / (len(queries) * k), 4),
+        "mb": round(bytes_per_vector * len(corpus) / 1e6, 1),
+        "query_ms": round(1000 * float(np.mean(latencies)), 2),
+        "p95_ms": round(1000 * float(np.percentile(latencies, 95)), 2),
+    }
+
+
+def print_report(results: list, k: int, n: int):
+    print(f"{n} vectors, recall@{k} against float32 at full size")
+    print(f"{'dims':>6}{'dtype':>9}{'rescore':>9}{f'recall@{k}':>11}{'MB':>9}{'ms/query':>10}{'p95 ms':>9}")
+    for r in results:
+        print(
+            f"{r['dims']:>6}{r['dtype']:>9}{'yes' if r['rescore'] else 'no':>9}{r['recall']:>11}"
+            f"{r['mb']:>9}{r['query_ms']:>10}{r['p95_ms']:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channel", help="use this channel's stored vectors")
+    parser.add_argument("--synthetic", type=int, help="use N synthetic vectors instead of the index")
+    parser.add_argument("--synthetic-dims", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", default="3072,1536,1024,512,256")
+    parser.add_argument("--dtypes", default="float32,float16,int8")
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        corpus = synthetic_vectors(args.synthetic, args.synthetic_dims)
+    else:
+        corpus = load_collection_vectors(args.channel)
+    if len(corpus) <= args.k:
+        parser.error("not enough vectors; index a channel first or pass --synthetic N")
+
+    queries = make_queries(corpus, args.queries)
+    truth = [exact_top_k(corpus, q, args.k) for q in queries]
+    full = corpus.shape[1]
+
+    results = []
+    for dims in sorted({min(int(d), full) for d in args.dims.split(",")}, reverse=True):
+        for dtype in args.dtypes.split(","):
+            for rescore in ([False, True] if dtype != "float32" else [False]):
+                results.append(run_config(corpus, queries, truth, dims, dtype, rescore, args.k))
+
+    print_report(results, args.k, len(corpus))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# tests/bench_startup.py
+"""
+Startup-time benchmark.
+
+Imports each entry module in a fresh interpreter, reports the wall-clock
+import time, and fails if a heavy dependency (torch, sentence_transformers,
+pandas, googleapiclient) got pulled into the import graph or a module fails
+to import at all. Dependencies that
+gradio itself already loads are not held against app.py.
+
+    python -m tests.bench_startup [--budget SECONDS]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "pandas", "googleapiclient"]
+
+TARGETS = [
+    "modules.embeddings",
+    "modules.db",
+    "modules.retriever",
+    "modules.answerer",
+    "modules.indexer",
+    "modules.collector",
+    "modules.channel_utils",
+    "youtube_poller",
+    "youtube_sync",
+    "downloader",
+    "app",
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def probe(module: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=None, help="max seconds per import")
+    args = parser.parse_args()
+
+    # whatever gradio drags in is outside our control
+    gradio_baseline = probe("gradio")
+    allowed = set(gradio_baseline.get("heavy", []))
+
+    failures = []
+    print(f"{'module':<24}{'import (s)':>12}  heavy deps")
+    for module in TARGETS:
+        stats = probe(module)
+        if "error" in stats:
+            print(f"{module:<24}{'-':>12}  ⚠️ {stats['error']}")
+            failures.append(f"{module} failed to import: {stats['error']}")
+            continue
+
+        offending = [m for m in stats["heavy"] if m not in allowed]
+        print(f"{module:<24}{stats['seconds']:>12.3f}  {', '.join(stats['heavy']) or '-'}")
+        if offending:
+            failures.append(f"{module} imports {', '.join(offending)}")
+        if args.budget is not None and stats["seconds"] > args.budget:
+            failures.append(f"{module} took {stats['seconds']:.2f}s (budget {args.budget}s)")
+
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures))
+        sys.exit(1)
+    print("\n✅ All modules import, no heavy imports at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# tests/embeddings_batch.py
+# Checks that get_embeddings packs inputs into few requests, using the local
+# fake embedding server instead of OpenAI.
+import os
+import tempfile
+
+from tests.fake_embedding_server import FakeEmbeddingServer
+
+server = FakeEmbeddingServer().start()
+os.environ["OPENAI_BASE_URL"] = server.base_url
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+
+from modules.embedding_cache import get_embedding_cache  # noqa: E402
+from modules.embeddings import get_embedding, get_embeddings, pack_batches  # noqa: E402
+
+texts = [f"Video {i} - description for video number {i}" for i in range(120)]
+embeddings = get_embeddings(texts)
+
+assert len(embeddings) == len(texts)
+assert embeddings[7] == get_embedding(texts[7])
+print(f"[TEST] {len(texts)} texts embedded in {server.requests} request(s)")
+
+requests_before = server.requests
+assert get_embeddings(texts + texts[:5]) == embeddings + embeddings[:5]
+assert server.requests == requests_before, "re-embedding should be served from cache"
+print("[TEST] cache:", get_embedding_cache().stats())
+
+batches = pack_batches(["x" * 3000] * 10, max_tokens=2500, max_inputs=2048)
+assert [len(b) for b in batches] == [2, 2, 2, 2, 2], batches
+print("[TEST] token packing OK:", [len(b) for b in batches])
+
+server.stop()
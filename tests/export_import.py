@@ -0,0 +1,80 @@
+# tests/export_import.py
+# Indexes a fake channel (embeddings from the local fake server), exports it,
+# deletes it and imports the dump back: every video returns with its vector
+# and without another embedding call. Videos synced after the import then get
+# seq numbers past the imported ones, so keyset paging lists each video once.
+import os
+import tempfile
+
+from tests.fake_embedding_server import FakeEmbeddingServer
+
+embedder = FakeEmbeddingServer().start()
+tmp = tempfile.mkdtemp()
+os.environ.update(
+    OPENAI_BASE_URL=embedder.base_url,
+    OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-fake"),
+    EMBEDDING_BACKEND="openai",
+    CHROMA_PATH=os.path.join(tmp, "db"),
+    EMBEDDING_CACHE_PATH=os.path.join(tmp, "embedding_cache.sqlite3"),
+    SYNC_STATE_PATH=os.path.join(tmp, "sync_state.sqlite3"),
+    LEXICAL_INDEX_PATH=os.path.join(tmp, "lexical_index.sqlite3"),
+    CHANNEL_VECTORS_PATH=os.path.join(tmp, "channel_vectors"),
+    ANSWER_CACHE_PATH=os.path.join(tmp, "answer_cache.sqlite3"),
+)
+
+from downloader import export_channel, import_channel  # noqa: E402
+from modules.channel_utils import fetch_channel_page  # noqa: E402
+from modules.db import delete_channel_from_collection, get_collection  # noqa: E402
+from modules.indexer import index_videos  # noqa: E402
+from modules.registry import count_channel_videos, get_channel_seq_bounds  # noqa: E402
+
+CHANNEL_ID = "UCfake0000"
+CHANNEL_URL = f"https://www.youtube.com/channel/{CHANNEL_ID}"
+
+
+def videos(start: int, stop: int) -> list:
+    return [
+        {
+            "video_id": f"v{i}",
+            "title": f"Video {i}",
+            "description": f"Description {i}",
+            "channel_id": CHANNEL_ID,
+            "channel_title": "Fake channel",
+            "published_at": f"2025-01-01T{i % 24:02d}:00:00Z",
+        }
+        for i in range(start, stop)
+    ]
+
+
+def listed() -> list:
+    ids, cursor = [], 0
+    while cursor is not None:
+        page, cursor = fetch_channel_page(CHANNEL_ID, after_seq=cursor, limit=3)
+        ids.extend(meta["video_id"] for meta in page)
+    return ids
+
+
+collection = get_collection()
+index_videos(videos(0, 20), collection, CHANNEL_URL)
+dump = export_channel(CHANNEL_ID, out_dir=tmp)
+delete_channel_from_collection(CHANNEL_ID)
+assert count_channel_videos(CHANNEL_ID) == 0
+
+requests = embedder.requests
+assert import_channel(dump) == 20
+assert embedder.requests == requests
+stored = collection.get(ids=["v0"], include=["embeddings"])
+assert len(stored["embeddings"][0]) > 0
+assert import_channel(dump) == 0
+print(f"[TEST] imported 20 videos from {os.path.basename(dump)} without embedding calls")
+
+# a sync after the import continues the channel's seq numbers
+index_videos(videos(20, 25), collection, CHANNEL_URL)
+seqs = [meta["seq"] for meta in collection.get(where={"channel_id": CHANNEL_ID}, include=["metadatas"])["metadatas"]]
+assert sorted(seqs) == list(range(1, 26)), sorted(seqs)
+assert get_channel_seq_bounds(CHANNEL_ID) == (25, 25), get_channel_seq_bounds(CHANNEL_ID)
+ids = listed()
+assert sorted(ids) == sorted(f"v{i}" for i in range(25)), ids
+print(f"[TEST] synced 5 more: seq 1–25 unique, paging lists all {len(ids)} videos once")
+
+embedder.stop()
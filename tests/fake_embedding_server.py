@@ -0,0 +1,103 @@
+# tests/fake_embedding_server.py
+"""
+Local stand-in for the OpenAI embeddings endpoint.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 and any
+OPENAI_API_KEY. Vectors are deterministic per input text, so repeated runs
+give identical results.
+"""
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_DIMENSIONS = 3072
+
+
+def fake_vector(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> list[float]:
+    seed = hashlib.sha256(text.encode("utf-8")).digest()
+    values = [(seed[i % len(seed)] - 127.5) / 127.5 for i in range(dimensions)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+class FakeEmbeddingServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.inputs = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/embeddings"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                inputs = body["input"]
+                if isinstance(inputs, str):
+                    inputs = [inputs]
+
+                with server.lock:
+                    server.requests += 1
+                    server.inputs += len(inputs)
+                if server.latency:
+                    time.sleep(server.latency)
+
+                dims = body.get("dimensions") or DEFAULT_DIMENSIONS
+                data = []
+                for i, text in enumerate(inputs):
+                    vector = fake_vector(text, dims)
+                    if body.get("encoding_format") == "base64":
+                        vector = base64.b64encode(
+                            struct.pack(f"<{len(vector)}f", *vector)
+                        ).decode("ascii")
+                    data.append({"object": "embedding", "index": i, "embedding": vector})
+
+                tokens = sum(len(t) for t in inputs) // 4
+                payload = json.dumps(
+                    {
+                        "object": "list",
+                        "data": data,
+                        "model": body.get("model", ""),
+                        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                    }
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    server = FakeEmbeddingServer(port=8765)
+    print(f"Fake embedding server on {server.base_url}")
+    server.httpd.serve_forever()
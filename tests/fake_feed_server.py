@@ -0,0 +1,103 @@
+# tests/fake_feed_server.py
+"""
+Local stand-in for YouTube's per-channel RSS feeds, with ETag /
+Last-Modified support so conditional GETs can be exercised.
+
+Point the poller at it with
+YOUTUBE_FEED_URL_TEMPLATE=http://127.0.0.1:<port>/feeds/videos.xml?channel_id={channel_id}
+"""
+import hashlib
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+
+def render_feed(channel_id: str, channel_title: str, videos: list) -> bytes:
+    entries = "".join(
+        f"""
+  <entry>
+    <id>yt:video:{v['video_id']}</id>
+    <yt:videoId>{v['video_id']}</yt:videoId>
+    <yt:channelId>{channel_id}</yt:channelId>
+    <title>{escape(v['title'])}</title>
+    <link rel="alternate" href="https://www.youtube.com/watch?v={v['video_id']}"/>
+    <published>{v['published_at']}</published>
+    <media:group>
+      <media:title>{escape(v['title'])}</media:title>
+      <media:description>{escape(v.get('description', ''))}</media:description>
+    </media:group>
+  </entry>"""
+        for v in videos[:15]
+    )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/" xmlns="http://www.w3.org/2005/Atom">
+  <title>{escape(channel_title)}</title>
+  <yt:channelId>{channel_id}</yt:channelId>{entries}
+</feed>""".encode("utf-8")
+
+
+class FakeFeedServer:
+    """channels: {channel_id: {"title": str, "videos": [newest first]}}"""
+
+    def __init__(self, channels: dict, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.channels = channels
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+
+    @property
+    def url_template(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/feeds/videos.xml?channel_id={{channel_id}}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                channel_id = parse_qs(urlparse(self.path).query).get("channel_id", [""])[0]
+                channel = server.channels.get(channel_id)
+                if channel is None:
+                    self.send_error(404)
+                    return
+
+                body = render_feed(channel_id, channel["title"], channel["videos"])
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    with server.lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/atom+xml; charset=utf-8")
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", formatdate(usegmt=True))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,148 @@
+# tests/fake_youtube_server.py
+"""
+Local stand-in for the two YouTube Data API v3 calls the collector makes:
+channels.list (by id or forHandle) and playlistItems.list over a channel's
+uploads playlist, with real pageToken paging.
+
+Point the collector at it with YOUTUBE_API_ENDPOINT=http://127.0.0.1:<port>
+and any YOUTUBE_API_KEY. fail_next() queues error responses (429, 503,
+quotaExceeded, ...) to exercise the client's retries.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeYouTubeServer:
+    """channels: {channel_id: {"title": str, "handle": str, "videos": [newest first]}}"""
+
+    def __init__(self, channels: dict, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.channels = channels
+        self.latency = latency
+        self.calls = Counter()
+        self.failures = []  # [(status, reason, retry_after)] served before real responses
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        return sum(self.calls.values())
+
+    def fail_next(self, status: int, reason: str = "backendError", count: int = 1, retry_after: int = None):
+        with self.lock:
+            self.failures.extend([(status, reason, retry_after)] * count)
+
+    def _channel_for_playlist(self, playlist_id: str):
+        channel_id = "UC" + playlist_id[2:]
+        return channel_id, self.channels.get(channel_id)
+
+    def channels_list(self, params: dict) -> dict:
+        if "forHandle" in params:
+            handle = params["forHandle"][0].lstrip("@")
+            ids = [cid for cid, c in self.channels.items() if c.get("handle") == handle]
+        else:
+            ids = [cid for cid in params.get("id", [""])[0].split(",") if cid in self.channels]
+        return {
+            "kind": "youtube#channelListResponse",
+            "items": [
+                {
+                    "id": cid,
+                    "snippet": {"title": self.channels[cid]["title"]},
+                    "contentDetails": {"relatedPlaylists": {"uploads": "UU" + cid[2:]}},
+                }
+                for cid in ids
+            ],
+        }
+
+    def playlist_items_list(self, params: dict) -> dict:
+        channel_id, channel = self._channel_for_playlist(params.get("playlistId", [""])[0])
+        if channel is None:
+            return None
+        page_size = min(int(params.get("maxResults", ["5"])[0]), 50)
+        start = int(params.get("pageToken", ["0"])[0] or 0)
+        videos = channel["videos"][start:start + page_size]
+        response = {
+            "kind": "youtube#playlistItemListResponse",
+            "pageInfo": {"totalResults": len(channel["videos"]), "resultsPerPage": page_size},
+            "items": [
+                {
+                    "snippet": {
+                        "title": v["title"],
+                        "description": v.get("description", ""),
+                        "publishedAt": v["published_at"],
+                        "channelId": channel_id,
+                        "resourceId": {"kind": "youtube#video", "videoId": v["video_id"]},
+                    }
+                }
+                for v in videos
+            ],
+        }
+        if start + page_size < len(channel["videos"]):
+            response["nextPageToken"] = str(start + page_size)
+        return response
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+                with server.lock:
+                    server.calls[endpoint] += 1
+                    failure = server.failures.pop(0) if server.failures else None
+                if server.latency:
+                    time.sleep(server.latency)
+                if failure:
+                    self._send_error(*failure)
+                    return
+
+                params = parse_qs(url.query)
+                if endpoint == "channels":
+                    body = server.channels_list(params)
+                elif endpoint == "playlistItems":
+                    body = server.playlist_items_list(params)
+                else:
+                    body = None
+                if body is None:
+                    self.send_error(404)
+                    return
+
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_error(self, status, reason, retry_after):
+                error = {"code": status, "message": reason, "errors": [{"reason": reason, "message": reason}]}
+                payload = json.dumps({"error": error}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(payload)))
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,87 @@
+# tests/poll_feeds.py
+# Runs the RSS poller against local fake feed + embedding servers:
+# first poll indexes every feed entry (with embeddings), the second poll is
+# all 304s, and a newly published video is picked up on the third. A new
+# upload whose store fails is fetched again (no 304) and stored on the next poll.
+import asyncio
+import os
+import tempfile
+
+from tests.fake_embedding_server import FakeEmbeddingServer
+from tests.fake_feed_server import FakeFeedServer
+
+CHANNELS = 50
+channels = {
+    f"UCfake{c:04d}": {
+        "title": f"Fake channel {c}",
+        "videos": [
+            {
+                "video_id": f"c{c}v{i}",
+                "title": f"Video {i}",
+                "description": f"Description {i}",
+                "published_at": f"2025-01-{28 - i:02d}T10:00:00+00:00",
+            }
+            for i in range(15)
+        ],
+    }
+    for c in range(CHANNELS)
+}
+
+feeds = FakeFeedServer(channels, latency=0.05).start()
+embedder = FakeEmbeddingServer().start()
+tmp = tempfile.mkdtemp()
+os.environ.update(
+    YOUTUBE_FEED_URL_TEMPLATE=feeds.url_template,
+    OPENAI_BASE_URL=embedder.base_url,
+    OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-fake"),
+    CHROMA_PATH=os.path.join(tmp, "db"),
+    EMBEDDING_CACHE_PATH=os.path.join(tmp, "embedding_cache.sqlite3"),
+    SYNC_STATE_PATH=os.path.join(tmp, "sync_state.sqlite3"),
+    LEXICAL_INDEX_PATH=os.path.join(tmp, "lexical_index.sqlite3"),
+    CHANNEL_VECTORS_PATH=os.path.join(tmp, "channel_vectors"),
+    ANSWER_CACHE_PATH=os.path.join(tmp, "answer_cache.sqlite3"),
+)
+
+from modules.db import get_collection  # noqa: E402
+import youtube_poller  # noqa: E402
+from youtube_poller import poll_once  # noqa: E402
+
+channel_ids = list(channels)
+
+found = asyncio.run(poll_once(channel_ids))
+assert sum(found.values()) == CHANNELS * 15, found
+stored = get_collection().get(ids=["c0v0"], include=["embeddings"])
+assert len(stored["embeddings"][0]) > 0
+print(f"[TEST] first poll: {sum(found.values())} new videos, {embedder.requests} embedding request(s)")
+
+found = asyncio.run(poll_once(channel_ids))
+assert sum(found.values()) == 0 and feeds.not_modified == CHANNELS
+print(f"[TEST] second poll: {feeds.not_modified} feeds unchanged (304)")
+
+channels["UCfake0001"]["videos"].insert(
+    0, {"video_id": "c1new", "title": "New upload", "description": "", "published_at": "2025-01-29T10:00:00+00:00"}
+)
+found = asyncio.run(poll_once(channel_ids))
+assert found["UCfake0001"] == 1 and sum(found.values()) == 1, found
+print("[TEST] third poll picked up the new upload")
+
+channels["UCfake0002"]["videos"].insert(
+    0, {"video_id": "c2new", "title": "Another upload", "description": "", "published_at": "2025-01-29T11:00:00+00:00"}
+)
+add_to_chroma = youtube_poller.add_to_chroma
+
+
+def failing_add(collection, videos):
+    raise RuntimeError("store unavailable")
+
+
+youtube_poller.add_to_chroma = failing_add
+found = asyncio.run(poll_once(channel_ids))
+assert found["UCfake0002"] == 1 and not get_collection().get(ids=["c2new"])["ids"], found
+youtube_poller.add_to_chroma = add_to_chroma
+found = asyncio.run(poll_once(channel_ids))
+assert found["UCfake0002"] == 1 and get_collection().get(ids=["c2new"])["ids"], found
+print("[TEST] an upload whose store failed was retried on the next poll")
+
+feeds.stop()
+embedder.stop()
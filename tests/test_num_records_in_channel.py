@@ -2,21 +2,20 @@
 import asyncio
 import time
 from typing import Optional
-from modules.db import get_collection 
+from modules.db import get_collection
+from modules.registry import get_channel_by_url
 
 
 def count_records_for_channel(collection, channel_url: str) -> int:
     """
     Returns how many records are loaded in a collection for the given channel_url.
+    Read from the channel registry's counter rather than an id scan.
     """
     if not channel_url:
         raise ValueError("channel_url must be provided")
 
-    results = collection.get(
-        where={"channel_url": channel_url},
-        include=[]
-    )
-    count = len(results["ids"])
+    channel = get_channel_by_url(channel_url)
+    count = channel["video_count"] if channel else 0
     print(f"[TEST] Channel '{channel_url}' has {count} records in collection.")
     return count
 
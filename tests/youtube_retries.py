@@ -0,0 +1,102 @@
+# tests/youtube_retries.py
+# Runs the YouTube client against the local fake API with injected faults:
+# 503s and 429s are retried (each retry charged to the quota), a
+# non-retryable 404 is not, and a quotaExceeded reply raises QuotaExceeded,
+# marks the day as spent and stops further calls before they are sent.
+import os
+import tempfile
+
+from tests.fake_youtube_server import FakeYouTubeServer
+
+channels = {
+    "UCfake0000": {
+        "title": "Fake channel",
+        "handle": "fake",
+        "videos": [
+            {"video_id": "v0", "title": "Video", "description": "", "published_at": "2025-01-01T10:00:00Z"}
+        ],
+    }
+}
+
+server = FakeYouTubeServer(channels).start()
+tmp = tempfile.mkdtemp()
+os.environ.update(
+    YOUTUBE_API_ENDPOINT=server.endpoint,
+    SYNC_STATE_PATH=os.path.join(tmp, "sync_state.sqlite3"),
+    YOUTUBE_MAX_RETRIES="3",
+    YOUTUBE_DAILY_QUOTA="100",
+)
+
+from googleapiclient.errors import HttpError  # noqa: E402
+
+import modules.youtube_client as yc  # noqa: E402
+from modules.metrics import _families  # noqa: E402
+
+yc.RETRY_BASE_SECONDS = 0.01  # keep the backoff short
+client = yc.YouTubeClient("fake-key")
+
+
+def channels_list():
+    return client.execute("channels.list", lambda s: s.channels().list(part="snippet", id="UCfake0000"))
+
+
+def retries() -> int:
+    values = _families.get("youtube_retries_total", {}).get("values", {})
+    return sum(values.values())
+
+
+# 503 twice, then a real response: two retries, three requests charged
+response = channels_list()
+assert response["items"][0]["id"] == "UCfake0000", response
+server.fail_next(503, count=2)
+before = server.requests
+response = channels_list()
+assert response["items"], response
+assert server.requests - before == 3 and retries() == 2, (server.requests - before, retries())
+assert yc.quota_used() == 4, yc.quota_used()
+print(f"[TEST] 503 x2: retried {retries()} times, {yc.quota_used()} quota units used")
+
+# 429 with Retry-After (rate limited) is retried as well
+server.fail_next(429, reason="rateLimitExceeded", retry_after=0)
+channels_list()
+assert retries() == 3, retries()
+print("[TEST] 429: retried once honouring Retry-After")
+
+# more failures than retries: the last error surfaces
+server.fail_next(503, count=4)
+try:
+    channels_list()
+    raise AssertionError("expected HttpError after exhausting retries")
+except HttpError as e:
+    assert e.resp.status == 503
+assert retries() == 6, retries()
+print("[TEST] 503 x4: gave up after YOUTUBE_MAX_RETRIES=3")
+
+# not retryable: fails on the first attempt
+server.fail_next(404, reason="notFound")
+try:
+    channels_list()
+    raise AssertionError("expected HttpError for 404")
+except HttpError as e:
+    assert e.resp.status == 404
+assert retries() == 6, retries()
+print("[TEST] 404: not retried")
+
+# YouTube says the quota is gone: raise, mark the day spent, send nothing more
+server.fail_next(403, reason="quotaExceeded")
+try:
+    channels_list()
+    raise AssertionError("expected QuotaExceeded")
+except yc.QuotaExceeded:
+    pass
+assert yc.quota_remaining() == 0 and yc.quota_low(), yc.quota_status()
+before = server.requests
+try:
+    channels_list()
+    raise AssertionError("expected QuotaExceeded before sending")
+except yc.QuotaExceeded:
+    pass
+assert server.requests == before
+print("[TEST] quotaExceeded: raised QuotaExceeded, later calls refused locally")
+
+server.stop()
@@ -1,33 +1,109 @@
-import feedparser
-from modules.db import get_collection, get_indexed_channels
+import asyncio
+import os
+import random
+import time
 
+import feedparser
+import httpx
 
-def fetch_channel_videos_rss(channel_id, max_results=50):
-    feed_url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
-    feed = feedparser.parse(feed_url)
+from modules.db import get_collection, get_indexed_channels
+from modules.indexer import build_records, drop_existing, embed_records, store_records, strip_records
+from modules.metrics import inc, span
+from modules.registry import get_channel
+from modules.sync_state import get_feed_validators, set_feed_validators
+
+FEED_URL_TEMPLATE = os.getenv(
+    "YOUTUBE_FEED_URL_TEMPLATE",
+    "https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}",
+)
+POLL_INTERVAL_SECONDS = float(os.getenv("POLL_INTERVAL_SECONDS", "600"))  # 10 minutes
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.2"))  # ±20% per channel
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "20"))
+POLL_EMBED_BATCH_SIZE = int(os.getenv("POLL_EMBED_BATCH_SIZE", "100"))
+POLL_EMBED_LINGER_SECONDS = 2.0  # wait this long for more new videos before embedding
+
+
+# -------------------------------
+# Feed fetching
+# -------------------------------
+def parse_feed_videos(content, channel_id, max_results=50):
+    feed = feedparser.parse(content)
+    channel_title = feed.feed.get("title")
     videos = []
     for entry in feed.entries[:max_results]:
+        published = entry.get("published_parsed")
         videos.append(
             {
                 "video_id": entry.yt_videoid,
                 "title": entry.title,
-                "published": entry.published,
+                "description": entry.get("summary", ""),
+                # same format as the Data API's publishedAt
+                "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", published) if published else "",
                 "link": entry.link,
                 "channel_id": channel_id,
+                "channel_title": channel_title,
             }
         )
     return videos
 
 
-def get_existing_video_ids(collection, channel_id):
-    # n_results: how many results to fetch; use a high number to get all entries
-    results = collection.get(where={"channel_id": channel_id})
+def fetch_channel_videos_rss(channel_id, max_results=50):
+    """Blocking, unconditional fetch of a channel feed (kept for scripts)."""
+    feed = httpx.get(FEED_URL_TEMPLATE.format(channel_id=channel_id), follow_redirects=True)
+    feed.raise_for_status()
+    return parse_feed_videos(feed.content, channel_id, max_results)
+
+
+async def fetch_channel_videos_rss_async(client: httpx.AsyncClient, channel_id, max_results=50):
+    """
+    Conditional GET of a channel feed. Returns None when the feed is unchanged
+    since the last poll (HTTP 304), otherwise (parsed videos, validators).
+    The validators are not saved here: only once the feed's new videos are
+    stored (see save_validators), or a failed store would hide them behind 304s.
+    """
+    validators = await asyncio.to_thread(get_feed_validators, channel_id)
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = await client.get(FEED_URL_TEMPLATE.format(channel_id=channel_id), headers=headers)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+
+    validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    return parse_feed_videos(response.content, channel_id, max_results), validators
+
+
+def save_validators(channel_id, validators: dict):
+    set_feed_validators(channel_id, validators.get("etag"), validators.get("last_modified"))
+
+
+class _FeedUpdate:
+    """A polled feed's new videos in flight; its validators are saved once all of them are stored."""
 
-    existing_ids = set()
-    for metadata in results.get("metadatas", []):
-        if metadata and "video_id" in metadata:
-            existing_ids.add(metadata["video_id"])
-    return existing_ids
+    def __init__(self, channel_id, validators: dict, pending: int):
+        self.channel_id = channel_id
+        self.validators = validators
+        self.pending = pending
+        self.failed = False
+
+    def stored(self, count: int = 1):
+        self.pending -= count
+        if self.pending == 0 and not self.failed:
+            save_validators(self.channel_id, self.validators)
+
+
+# -------------------------------
+# New-video detection + indexing
+# -------------------------------
+def get_existing_video_ids(collection, video_ids):
+    """Id-only lookup: which of these videos are already indexed."""
+    if not video_ids:
+        return set()
+    return set(collection.get(ids=list(video_ids), include=[])["ids"])
 
 
 def filter_new_videos(videos, existing_ids):
@@ -35,40 +111,143 @@ def filter_new_videos(videos, existing_ids):
 
 
 def add_to_chroma(collection, new_videos):
+    """Embed (same model as the main index) and store new videos, grouped by channel."""
     if not new_videos:
-        return
-    collection.add(
-        documents=[v["title"] for v in new_videos],
-        metadatas=[
-            {
-                "video_id": v["video_id"],
-                "channel_id": v["channel_id"],
-                "link": v["link"],
-            }
-            for v in new_videos
-        ],
-        ids=[v["video_id"] for v in new_videos],
+        return 0
+    added = 0
+    per_channel = {}
+    for v in new_videos:
+        per_channel.setdefault(v["channel_id"], []).append(v)
+    for channel_id, videos in per_channel.items():
+        channel = get_channel(channel_id)
+        channel_url = channel["channel_url"] if channel and channel["channel_url"] else channel_id
+        records = drop_existing(collection, build_records(videos, channel_url))
+        added += store_records(collection, embed_records(strip_records(records)))
+    return added
+
+
+async def poll_channel(client, collection, channel_id, found: asyncio.Queue, sem: asyncio.Semaphore):
+    async with sem:
+        try:
+            with span("poll_feed"):
+                feed = await fetch_channel_videos_rss_async(client, channel_id)
+        except Exception:
+            return 0  # counted in stage_errors_total; the feed is fetched in full next time
+    if feed is None:
+        return 0
+    latest_videos, validators = feed
+
+    existing_ids = await asyncio.to_thread(
+        get_existing_video_ids, collection, [v["video_id"] for v in latest_videos]
     )
-
-
-def incremental_update(collection, channel_id):
-    existing_ids = get_existing_video_ids(collection, channel_id)
-    latest_videos = fetch_channel_videos_rss(channel_id)
     new_videos = filter_new_videos(latest_videos, existing_ids)
-
-    if new_videos:
-        add_to_chroma(collection, new_videos)
-        print(f"Added {len(new_videos)} new videos from {channel_id}")
-    else:
-        print(f"No new videos for {channel_id}")
+    if not new_videos:
+        await asyncio.to_thread(save_validators, channel_id, validators)
+        return 0
+    update = _FeedUpdate(channel_id, validators, len(new_videos))
+    for v in new_videos:
+        await found.put((v, update))
+    return len(new_videos)
+
+
+async def _index_found_videos(collection, found: asyncio.Queue):
+    """
+    Drain newly found videos into batches so one embedding request covers
+    many channels' new uploads. A feed's validators are saved once all its new
+    videos are stored; a failed batch leaves them unsaved, so the next poll
+    gets the full feed again and retries the videos.
+    """
+    while True:
+        batch = [await found.get()]
+        deadline = time.monotonic() + POLL_EMBED_LINGER_SECONDS
+        while len(batch) < POLL_EMBED_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(found.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        updates = {}
+        for _, update in batch:
+            updates[update] = updates.get(update, 0) + 1
+        try:
+            with span("poll_index"):
+                added = await asyncio.to_thread(add_to_chroma, collection, [v for v, _ in batch])
+            print(f"[POLL] Added {added} new videos")
+            for update, count in updates.items():
+                await asyncio.to_thread(update.stored, count)
+        except Exception:
+            # counted in stage_errors_total
+            inc("poll_videos_failed_total", len(batch), help_text="New videos whose store failed (retried next poll)")
+            for update in updates:
+                update.failed = True
+        finally:
+            for _ in batch:
+                found.task_done()
+
+
+# -------------------------------
+# Scheduling
+# -------------------------------
+def _next_due(now: float) -> float:
+    return now + POLL_INTERVAL_SECONDS * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+
+async def poll_once(channel_ids=None, collection=None):
+    """Poll every channel once, concurrently, and wait for new videos to be indexed."""
+    collection = collection or get_collection()
+    channel_ids = list(channel_ids or get_indexed_channels().keys())
+    found = asyncio.Queue()
+    sem = asyncio.Semaphore(POLL_CONCURRENCY)
+    indexer = asyncio.create_task(_index_found_videos(collection, found))
+    try:
+        async with httpx.AsyncClient(follow_redirects=True, timeout=30) as client:
+            counts = await asyncio.gather(
+                *(poll_channel(client, collection, cid, found, sem) for cid in channel_ids)
+            )
+        await found.join()
+    finally:
+        indexer.cancel()
+    return dict(zip(channel_ids, counts))
+
+
+async def poll_forever():
+    """
+    Each channel runs on its own jittered schedule, so hundreds of channels are
+    spread across the interval instead of being hit in one burst.
+    """
+    collection = get_collection()
+    found = asyncio.Queue()
+    sem = asyncio.Semaphore(POLL_CONCURRENCY)
+    due = {}
+    in_flight = set()
+    indexer = asyncio.create_task(_index_found_videos(collection, found))
+
+    async with httpx.AsyncClient(follow_redirects=True, timeout=30) as client:
+        while True:
+            now = time.time()
+            channel_ids = await asyncio.to_thread(lambda: list(get_indexed_channels().keys()))
+            for cid in channel_ids:
+                # first poll of a channel lands at a random point in the interval
+                due.setdefault(cid, now + random.uniform(0, POLL_INTERVAL_SECONDS))
+            for cid in list(due):
+                if cid not in channel_ids:
+                    del due[cid]
+
+            for cid, when in due.items():
+                if when <= now:
+                    due[cid] = _next_due(now)
+                    task = asyncio.create_task(poll_channel(client, collection, cid, found, sem))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+
+            if indexer.done():
+                indexer = asyncio.create_task(_index_found_videos(collection, found))
+            # wake for the next due channel, and at least every 30s to pick up new channels
+            next_wake = min(due.values(), default=now + 30) - time.time()
+            await asyncio.sleep(min(30.0, max(1.0, next_wake)))
 
 
 def start_poll():
-    import time
-
-    configured_channels = get_indexed_channels().keys()
-
-    while True:
-        for channel_id in configured_channels:
-            incremental_update(get_collection(), channel_id)
-        time.sleep(600)  # 10 minutes
+    asyncio.run(poll_forever())
@@ -1,78 +1,530 @@
+import os
+import queue
 import threading
-import gradio as gr
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 
+from modules.boilerplate import boilerplate_stats
 from modules.collector import fetch_all_channel_videos
 from modules.db import get_collection
-from modules.indexer import index_videos
+from modules.indexer import build_records, drop_existing, embed_records, store_records, strip_records
+from modules.registry import get_channel_by_url, touch_channel
+from modules.metrics import inc
+from modules.sync_jobs import (
+    cancel_job,
+    create_job,
+    get_checkpoint,
+    get_job,
+    interrupted_jobs,
+    register_job,
+    save_checkpoint,
+    set_job_status,
+    unregister_job,
+)
+from modules.sync_state import WATERMARK_ID_LIMIT, advance_watermark
+from modules.youtube_client import QuotaExceeded, quota_low, quota_remaining
+
+if TYPE_CHECKING:  # the sync itself does not need the UI stack
+    import gradio as gr
 
-# global stop signal
-stop_event = threading.Event()
 MAX_BATCHES = 200  # safety cutoff
 
-def stop_sync():
-    """External call to stop the sync process."""
-    stop_event.set()
+# Streaming pipeline knobs: queue sizes bound how many pages may sit between
+# stages (and so the memory used), embed workers bound concurrent embedding calls.
+PIPELINE_QUEUE_SIZE = int(os.getenv("SYNC_PIPELINE_QUEUE_SIZE", "4"))
+EMBED_WORKERS = int(os.getenv("SYNC_EMBED_WORKERS", "4"))
+
+# Multi-channel scheduling: how many channels sync at once, and the global
+# caps they share (embedding batches in flight, concurrent Chroma writes).
+# YouTube calls are capped by the client's own rate limiter.
+CHANNEL_CONCURRENCY = int(os.getenv("SYNC_CHANNEL_CONCURRENCY", "3"))
+_embed_slots = threading.BoundedSemaphore(int(os.getenv("SYNC_EMBED_CONCURRENCY", "8")))
+_store_slots = threading.BoundedSemaphore(int(os.getenv("SYNC_STORE_CONCURRENCY", "1")))
+
+# a page whose embedding or store fails is retried this often before the
+# channel is marked failed (its checkpoint stays before the page)
+BATCH_RETRIES = int(os.getenv("SYNC_BATCH_RETRIES", "2"))
+BATCH_RETRY_DELAY = 1.0
+
+_DONE = object()
+
 
-def sync_channels_from_youtube(api_key, channel_urls: list, progress: gr.Progress = None):
+def stop_sync(job_id: str = None):
+    """Stop one sync job, or every job running in this process."""
+    return cancel_job(job_id)
+
+
+def sync_channels_from_youtube(
+    api_key,
+    channel_urls: list,
+    progress: "gr.Progress" = None,
+    delta: bool = True,
+    stats: dict = None,
+    job_id: str = None,
+):
     """
-    Sync multiple channels, yielding (progress_message, videos_indexed_in_batch)
+    Sync multiple channels, yielding (progress_message, videos_indexed_in_batch).
+    With delta=True, channels synced before only fetch pages newer than their watermark.
+    Pass a dict as stats to collect each channel's pipeline stats by URL.
+
+    Up to SYNC_CHANNEL_CONCURRENCY channels run at once, each as its own
+    pipeline; their messages are interleaved in the order they happen. YouTube
+    calls (token bucket), embedding calls and store writes are limited
+    globally, so more channels share the same budget rather than adding to it.
+
+    The run is a persisted job (see modules/sync_jobs.py). Pass the job_id of
+    an earlier job to resume it: finished channels are skipped and the others
+    continue from their checkpoints.
     """
-    global stop_event
-    stop_event.clear()
+    if job_id is None:
+        job_id = create_job(channel_urls, delta)
+        yield f"🆔 Sync job {job_id} started", 0
+    cancel = register_job(job_id)
+    set_job_status(job_id, "running")
 
     total_channels = len(channel_urls)
     total_videos = 0
+    deferred = 0
+    channel_stats = {url: {} for url in channel_urls}
+    if stats is not None:
+        stats.update(channel_stats)
 
+    messages = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE * max(1, CHANNEL_CONCURRENCY))
+    abort = threading.Event()
+    workers = min(CHANNEL_CONCURRENCY, total_channels) or 1
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync-channel")
     for idx, channel_url in enumerate(channel_urls, 1):
-        if stop_event.is_set():
-            yield f"🛑 Stopped before processing channel: {channel_url}", 0
+        pool.submit(
+            _sync_channel_worker,
+            api_key, channel_url, f"{idx}/{total_channels}", delta, channel_stats[channel_url], messages, abort,
+            job_id, cancel,
+        )
+
+    finished = 0
+    try:
+        while finished < total_channels:
+            try:
+                kind, message, count = messages.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if kind == "done":
+                finished += 1
+                continue
+            if kind == "deferred":
+                deferred += 1
+            total_videos += count
+            if progress:
+                _report_progress(progress, channel_stats.values())
+            yield message, count
+    finally:
+        # also reached when the consumer goes away mid-sync; the job stays
+        # "running" then and is resumed like a crashed one
+        abort.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        unregister_job(job_id)
+
+    statuses = [c["status"] for c in get_job(job_id)["channels"].values()]
+    if all(status == "done" for status in statuses):
+        status = "completed"
+    else:
+        status = "cancelled" if cancel.is_set() else "incomplete"
+    set_job_status(job_id, status)
+
+    summary = f"✅ Finished syncing. Total channels: {total_channels}, total videos: {total_videos}"
+    if deferred:
+        summary += f", deferred until the quota resets: {deferred}"
+    if status != "completed":
+        summary += f". Job {job_id} is {status}; resume it to sync the rest"
+    yield summary, 0
+
+
+def resume_job(api_key, job_id: str, progress: "gr.Progress" = None, stats: dict = None):
+    """Continue an earlier job from its checkpoints (same stream as sync_channels_from_youtube)."""
+    job = get_job(job_id)
+    if job is None:
+        yield f"⚠️ No sync job {job_id}", 0
+        return
+    if job["status"] == "completed":
+        yield f"✅ Sync job {job_id} already completed", 0
+        return
+    pending = sum(c["status"] != "done" for c in job["channels"].values())
+    yield f"♻️ Resuming sync job {job_id} ({pending}/{len(job['channel_urls'])} channels left)", 0
+    yield from sync_channels_from_youtube(
+        api_key, job["channel_urls"], progress, delta=job["delta"], stats=stats, job_id=job_id
+    )
+
+
+def resume_interrupted_jobs(api_key):
+    """Resume every job a previous process left running (call once at startup)."""
+    for job in interrupted_jobs():
+        yield from resume_job(api_key, job["job_id"])
+
+
+def _sync_channel_worker(
+    api_key, channel_url, position, delta, stats, messages: queue.Queue, abort, job_id, cancel
+):
+    """Run one channel's pipeline and forward its messages to the scheduler."""
+    try:
+        checkpoint = get_checkpoint(job_id, channel_url)
+        if checkpoint and checkpoint["status"] == "done":
+            _put(messages, ("message", f"⏭️ {channel_url} already synced by job {job_id}", 0), abort)
+            return
+        if cancel.is_set():
+            _put(messages, ("message", f"🛑 Stopped before processing channel: {channel_url}", 0), abort)
+            return
+
+        channel_delta, reason = _plan_for_quota(channel_url, delta)
+        if channel_delta is None:
+            save_checkpoint(job_id, channel_url, status="deferred", message=reason)
+            _put(messages, ("deferred", reason, 0), abort)
+            return
+        if reason:
+            _put(messages, ("message", reason, 0), abort)
+
+        if checkpoint and checkpoint["page_token"]:
+            position += f", resuming after {checkpoint['pages_done']} pages"
+        _put(messages, ("message", f"🔄 Syncing {channel_url} ({position})", 0), abort)
+        updates = _refresh_single_channel(
+            api_key, channel_url, None, stats=stats, delta=channel_delta, job_id=job_id, cancel=cancel
+        )
+        try:
+            for update_message, batch_count in updates:
+                if not _put(messages, ("message", update_message, batch_count), abort):
+                    break
+        finally:
+            updates.close()
+    except Exception as e:
+        _put(messages, ("message", f"⚠️ Error syncing {channel_url}: {e}", 0), abort)
+    finally:
+        _put(messages, ("done", None, 0), abort)
+
+
+def _report_progress(progress, all_stats):
+    """Overall progress: videos stored over videos fetched, across channels."""
+    fetched = sum(s.get("fetched", 0) for s in all_stats)
+    indexed = sum(s.get("indexed", 0) for s in all_stats)
+    if fetched:
+        progress(indexed / fetched)
+
+
+def _plan_for_quota(channel_url: str, delta: bool):
+    """
+    Decide how to sync a channel given today's YouTube quota. Returns
+    (delta, message): delta is None when the channel must wait for the quota
+    reset. Once only the reserve is left, channels with a watermark fall back
+    to a cheap delta sync and channels never synced before are deferred.
+    """
+    remaining = quota_remaining()
+    if remaining <= 0:
+        return None, f"⏸️ YouTube quota used up for today; deferring {channel_url}"
+    if not quota_low():
+        return delta, None
+
+    known = get_channel_by_url(channel_url)
+    if not (known and known["watermark"]):
+        return None, f"⏸️ YouTube quota low ({remaining} units left); deferring full sync of {channel_url}"
+    if not delta:
+        return True, f"⚠️ YouTube quota low ({remaining} units left); delta sync instead of full for {channel_url}"
+    return True, None
+
+
+# -------------------------------
+# Streaming fetch → embed → store pipeline
+# -------------------------------
+def _put(q: queue.Queue, item, abort: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is aborted."""
+    while not abort.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _retrying(fn, what: str, abort: threading.Event):
+    """Run fn, retrying failures with exponential backoff (BATCH_RETRIES times)."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= BATCH_RETRIES or abort.is_set():
+                raise
+            delay = BATCH_RETRY_DELAY * 2**attempt
+            attempt += 1
+            inc("sync_batch_retries_total", help_text="Retried sync batches", stage=what)
+            print(f"[SYNC] {what} failed ({e}), retry {attempt}/{BATCH_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _newest(videos: list) -> list:
+    """The WATERMARK_ID_LIMIT most recent videos: all advance_watermark keeps of a channel."""
+    return sorted(videos, key=lambda v: v["published_at"], reverse=True)[:WATERMARK_ID_LIMIT]
+
+
+def _fetch_stage(api_key, channel_url, delta, page_token, pages: queue.Queue, out: queue.Queue, abort, stats):
+    cursor = {}
+    try:
+        for _, videos in fetch_all_channel_videos(
+            api_key, channel_url, delta=delta, page_token=page_token, cursor=cursor
+        ):
+            if abort.is_set():
+                break
+            if not videos:
+                continue
+            stats["pages"] += 1
+            stats["fetched"] += len(videos)
+            # just enough to move the watermark once the whole channel is in
+            stats["seen"] = _newest(
+                stats["seen"]
+                + [{"video_id": v["video_id"], "published_at": v.get("published_at", "")} for v in videos]
+            )
+            stats["channel_id"] = videos[0].get("channel_id")
+            batch = [v | {"channel_url": channel_url} for v in videos]
+            # pages carry their number and the token after them, for checkpoints
+            if not _put(pages, (stats["pages"], cursor.get("next_page_token"), batch), abort):
+                break
+        stats["fetch_complete"] = True
+    except QuotaExceeded as e:
+        _put(out, ("error", None, None, f"⏸️ {e}; {channel_url} resumes on the next sync"), abort)
+    except Exception as e:
+        _put(out, ("error", None, None, f"⚠️ Error fetching {channel_url}: {e}"), abort)
+    finally:
+        stats["fetch_seconds"] = time.perf_counter() - stats["started"]
+        for _ in range(EMBED_WORKERS):
+            _put(pages, _DONE, abort)
+
+
+def _embed_stage(channel_url, collection, pages: queue.Queue, out: queue.Queue, abort, stats, lock):
+    def embed_page(batch):
+        records = _retrying(lambda: drop_existing(collection, build_records(batch, channel_url)), "embed", abort)
+        # learns from the page's new videos; once, so a retried embed does not count them again
+        records = strip_records(records)
+
+        def embed():
+            with _embed_slots:
+                return embed_records(records)
+
+        return _retrying(embed, "embed", abort)
+
+    while not abort.is_set():
+        try:
+            item = pages.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        if item is _DONE:
+            break
+        page, next_token, batch = item
+        started = time.perf_counter()
+        try:
+            item = ("records", page, next_token, embed_page(batch))
+        except Exception as e:
+            item = ("error", page, next_token, f"⚠️ Error indexing {channel_url}: {e}")
+        with lock:
+            stats["embed_seconds"] += time.perf_counter() - started
+        if not _put(out, item, abort):
             break
+    _put(out, _DONE, abort)
 
-        yield f"🔄 Syncing {channel_url} ({idx}/{total_channels})", 0
 
-        # stream video-level progress from inner generator
-        for update_message, batch_count in _refresh_single_channel(api_key, channel_url, progress):
-            total_videos += batch_count
-            yield update_message, batch_count
+def _log_boilerplate(channel_id: str):
+    channel = boilerplate_stats(channel_id).get(channel_id)
+    if channel and channel["tokens_before"]:
+        print(
+            f"[SYNC] {channel_id}: {channel['lines']} boilerplate lines, ~{channel['tokens_saved']} of "
+            f"~{channel['tokens_before']} document tokens stripped "
+            f"({100 * channel['tokens_saved'] / channel['tokens_before']:.0f}%)"
+        )
 
-    yield f"✅ Finished syncing. Total channels: {total_channels}, total videos: {total_videos}", 0
 
+def _store_page(collection, records: dict, done: set) -> int:
+    with _store_slots:
+        return store_records(collection, records, done)
 
-def _refresh_single_channel(api_key, channel_url, progress):
-    # fetch all batches first
-    fetched_batches = list(fetch_all_channel_videos(api_key, channel_url))
-    all_videos = [v | {"channel_url": channel_url} for _, batch in fetched_batches for v in batch]
-    total_videos = len(all_videos)
 
-    if total_videos == 0:
-        yield f"{channel_url}: No videos found", 0
-        return
+_channel_locks = {}  # channel URL -> lock held while a sync writes that channel
+_channel_locks_guard = threading.Lock()
+CHANNEL_LOCK_NOTICE_SECONDS = 10.0
+
+
+def _channel_lock(channel_url: str) -> threading.Lock:
+    key = channel_url.strip().rstrip("/").lower()
+    with _channel_locks_guard:
+        return _channel_locks.setdefault(key, threading.Lock())
+
 
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = [
-            executor.submit(index_videos, batch, get_collection(), channel_url=channel_url)
-            for _, batch in fetched_batches
-        ]
+def _refresh_single_channel(
+    api_key,
+    channel_url,
+    progress,
+    stats: dict = None,
+    delta: bool = True,
+    job_id: str = None,
+    cancel: threading.Event = None,
+):
+    """
+    Sync one channel (see _sync_channel_pipeline), waiting while another
+    sync - e.g. a job resumed at startup - is writing the same channel.
+    """
+    cancel = cancel or threading.Event()
+    lock = _channel_lock(channel_url)
+    if not lock.acquire(blocking=False):
+        # repeated while waiting, which also lets a departed consumer close us
+        yield f"⏳ {channel_url} is being synced by another job; waiting", 0
+        while not lock.acquire(timeout=CHANNEL_LOCK_NOTICE_SECONDS):
+            if cancel.is_set():
+                yield f"🛑 Stopped while waiting for another sync of {channel_url}", 0
+                return
+            yield f"⏳ {channel_url} is being synced by another job; waiting", 0
+    try:
+        yield from _sync_channel_pipeline(api_key, channel_url, progress, stats, delta, job_id, cancel)
+    finally:
+        lock.release()
+
+
+def _sync_channel_pipeline(
+    api_key,
+    channel_url,
+    progress,
+    stats: dict = None,
+    delta: bool = True,
+    job_id: str = None,
+    cancel: threading.Event = None,
+):
+    """
+    Index one channel as a bounded pipeline: pages are embedded while later
+    pages are still being fetched, and stored as soon as they are embedded.
+    The bounded queues apply backpressure, so memory stays flat regardless of
+    channel size. This generator is the store stage.
+
+    stats holds counts only (stats["indexed"]: videos actually added) plus
+    the newest videos seen, for the watermark. The channel watermark only
+    advances when every page was fetched and stored without errors, so a
+    failed batch is picked up again next time.
+
+    Within a job, the channel's checkpoint moves past every run of pages
+    stored without gaps, and paging starts from the checkpoint's token.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(
+        pages=0, fetched=0, indexed=0, errors=0, started=time.perf_counter(),
+        fetch_seconds=0.0, embed_seconds=0.0, store_seconds=0.0,
+        seen=[], channel_id=None, fetch_complete=False,
+    )
+    cancel = cancel or threading.Event()
+    checkpoint = get_checkpoint(job_id, channel_url) if job_id else None
+    checkpoint = checkpoint or {"page_token": None, "pages_done": 0, "videos_done": 0, "head": []}
+    if job_id:
+        save_checkpoint(job_id, channel_url, status="running")
+    collection = get_collection()
+
+    pages = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    embedded = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    abort = threading.Event()
+    lock = threading.Lock()
 
-        completed_videos = 0
-        for f in as_completed(futures):
-            if stop_event.is_set():
-                yield "🛑 Stop requested during indexing stage", completed_videos
+    threads = [
+        threading.Thread(
+            target=_fetch_stage,
+            args=(api_key, channel_url, delta, checkpoint["page_token"], pages, embedded, abort, stats),
+            daemon=True,
+        )
+    ] + [
+        threading.Thread(
+            target=_embed_stage,
+            args=(channel_url, collection, pages, embedded, abort, stats, lock),
+            daemon=True,
+        )
+        for _ in range(EMBED_WORKERS)
+    ]
+    for t in threads:
+        t.start()
+
+    stored_pages = {}  # page number -> token after it, for stored pages past the checkpoint
+    next_page = 1  # first page (of this run) not yet covered by the checkpoint
+    last_error = None
+    finished_workers = 0
+    stopped = False
+    try:
+        while finished_workers < EMBED_WORKERS:
+            if cancel.is_set():
+                stopped = True
+                yield "🛑 Stop requested during indexing stage", 0
                 break
 
             try:
-                indexed_count = f.result()
-                if indexed_count is None:
-                    indexed_count = len(all_videos)  # fallback if index_videos doesn't return
+                item = embedded.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                finished_workers += 1
+                continue
+
+            kind, page, next_token, payload = item
+            if kind == "error":
+                stats["errors"] += 1
+                last_error = payload
+                yield payload, 0
+                continue
+
+            started = time.perf_counter()
+            done = set()  # store steps completed, so a retry picks up after them
+            try:
+                indexed_count = _retrying(lambda: _store_page(collection, payload, done), "store", abort)
             except Exception as e:
-                indexed_count = 0
-                yield f"⚠️ Error indexing {channel_url}: {e}", completed_videos
+                stats["errors"] += 1
+                last_error = f"⚠️ Error indexing {channel_url}: {e}"
+                yield last_error, 0
+                continue
+            finally:
+                stats["store_seconds"] += time.perf_counter() - started
 
-            completed_videos += indexed_count
-            pct = 100.0 * completed_videos / max(1, total_videos)
+            stats["indexed"] += indexed_count
 
-            if progress:
-                progress(completed_videos / total_videos)
+            stored_pages[page] = next_token
+            if job_id and next_page in stored_pages:
+                while next_page in stored_pages:
+                    token = stored_pages.pop(next_page)
+                    next_page += 1
+                save_checkpoint(
+                    job_id, channel_url,
+                    page_token=token,
+                    pages_done=checkpoint["pages_done"] + next_page - 1,
+                    videos_done=checkpoint["videos_done"] + stats["indexed"],
+                    head=_newest(checkpoint["head"] + stats["seen"]),
+                )
+
+            if progress and stats["fetched"]:
+                progress(stats["indexed"] / stats["fetched"])
+
+            yield (
+                f"{channel_url}: Indexed {stats['indexed']}/{stats['fetched']} fetched videos",
+                indexed_count,
+            )
+    finally:
+        abort.set()
+        stats["total_seconds"] = time.perf_counter() - stats["started"]
+        print(
+            f"[SYNC] {channel_url}: {stats['indexed']} videos in {stats['total_seconds']:.1f}s "
+            f"(fetch {stats['fetch_seconds']:.1f}s, embed {stats['embed_seconds']:.1f}s, "
+            f"store {stats['store_seconds']:.1f}s)"
+        )
+        if stats["channel_id"] and stats["indexed"]:
+            _log_boilerplate(stats["channel_id"])
+
+    complete = stats["fetch_complete"] and not stats["errors"] and not stopped
+    if complete and stats["channel_id"]:
+        # videos stored by earlier runs of this job count towards the watermark too
+        advance_watermark(stats["channel_id"], checkpoint["head"] + stats["seen"])
+        touch_channel(stats["channel_id"])
+    stats["seen"] = []
+    if job_id:
+        status = "done" if complete else ("cancelled" if stopped else "failed")
+        save_checkpoint(job_id, channel_url, status=status, message=last_error)
 
-            yield f"{channel_url}: Indexed {completed_videos}/{total_videos} videos — {pct:.1f}%", completed_videos
+    if stats["fetched"] == 0:
+        yield f"{channel_url}: No new videos found" if delta else f"{channel_url}: No videos found", 0
+    else:
+        yield f"{channel_url}: {stats['indexed']} new videos indexed", 0